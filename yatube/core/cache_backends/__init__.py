@@ -0,0 +1,17 @@
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.module_loading import import_string
+
+# Бэкенды, содержимое которых видно только своему процессу.
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def is_process_local(backend):
+    """Не увидят ли другие процессы (воркеры, manage.py) записанное сюда."""
+    return isinstance(backend, PROCESS_LOCAL_BACKENDS)
+
+
+def is_process_local_config(config):
+    """То же по словарю из CACHES - до того, как кэши созданы."""
+    return issubclass(import_string(config['BACKEND']),
+                      PROCESS_LOCAL_BACKENDS)
@@ -0,0 +1,235 @@
+"""Общий для всех воркеров кэш в файле SQLite с вытеснением LRU.
+
+Не требует внешнего сервиса: процессы gunicorn открывают один файл
+и видят одни и те же фрагменты. incr и add выполняются в транзакции
+BEGIN IMMEDIATE и атомарны между процессами.
+
+Число ключей проверяется не при каждой записи, а раз в CULL_EVERY
+записей процесса (OPTIONS, по умолчанию 100): между проверками кэш
+может превысить MAX_ENTRIES на CULL_EVERY ключей на процесс. Сколько
+вытеснять, как и у встроенного кэша в базе, задаёт CULL_FREQUENCY.
+"""
+import os
+import itertools
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+'''
+
+# Время доступа обновляется не чаще раза в секунду на ключ,
+# чтобы чтение не превращалось в запись.
+ACCESS_RESOLUTION = 1.0
+
+
+@contextmanager
+def immediate(connection):
+    """Транзакция с блокировкой записи с самого начала."""
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        yield connection
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    connection.execute('COMMIT')
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = os.path.abspath(location)
+        self._local = threading.local()
+        self._inherited = []
+        self._cull_every = max(int(
+            params.get('OPTIONS', {}).get('CULL_EVERY', 100)), 1)
+        self._writes = itertools.count(1)
+
+    def _connection(self):
+        # Отдельное соединение на поток и на процесс: после fork
+        # соединение родителя использовать нельзя.
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            if hasattr(self._local, 'connection'):
+                # Соединение родителя не закрываем и не отдаём сборщику
+                # мусора: закрытие в потомке снимет блокировки родителя.
+                self._inherited.append(self._local.connection)
+            directory = os.path.dirname(self._path)
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+            self._local.pid = pid
+        return self._local.connection
+
+    def _encode(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _is_live(self, expires, now):
+        return expires is None or expires > now
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._get_many([key]).get(key, default)
+
+    def _get_many(self, keys):
+        connection = self._connection()
+        now = time.time()
+        placeholders = ','.join('?' * len(keys))
+        rows = connection.execute(
+            f'SELECT key, value, expires, accessed FROM cache '
+            f'WHERE key IN ({placeholders})', keys,
+        ).fetchall()
+        found = {}
+        touched = []
+        for key, value, expires, accessed in rows:
+            if not self._is_live(expires, now):
+                continue
+            found[key] = pickle.loads(value)
+            if now - accessed > ACCESS_RESOLUTION:
+                touched.append((now, key))
+        if touched:
+            connection.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?', touched)
+        return found
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_key(key, version=version): key for key in keys}
+        for key in key_map:
+            self.validate_key(key)
+        if not key_map:
+            return {}
+        found = self._get_many(list(key_map))
+        return {key_map[key]: value for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        rows = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            rows.append((key, self._encode(value), expires, now))
+        with immediate(self._connection()) as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)', rows,
+            )
+            self._cull(connection, now)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        with immediate(self._connection()) as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, now),
+            )
+            added = connection.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                (key, self._encode(value), expires, now),
+            ).rowcount == 1
+            if added:
+                self._cull(connection, now)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with immediate(self._connection()) as connection:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,),
+            ).fetchone()
+            if row is None or not self._is_live(row[1], now):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ?, accessed = ? WHERE key = ?',
+                (self._encode(value), now, key),
+            )
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        return self._connection().execute(
+            'UPDATE cache SET expires = ?, accessed = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now, key, now),
+        ).rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._connection().execute(
+            'SELECT 1 FROM cache '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        for key in keys:
+            self.validate_key(key)
+        self._connection().executemany(
+            'DELETE FROM cache WHERE key = ?', [(key,) for key in keys])
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт весь срок воркера, как у LocMemCache.
+        pass
+
+    def _cull(self, connection, now):
+        # next() у itertools.count атомарен, отдельная блокировка не нужна.
+        if next(self._writes) % self._cull_every:
+            return
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (now,))
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        # Вытесняем давно не читавшиеся ключи.
+        connection.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (count // self._cull_frequency,),
+        )
@@ -0,0 +1,42 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Выставляет SQLITE_PRAGMAS каждому новому соединению SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def reset_child_connections():
+    """Инициализатор процесса пула: свои обёртки соединений с базой.
+
+    Наследовать нечего - start_pool закрыл соединения родителя до fork.
+    Потомок лишь получает чистые DatabaseWrapper без состояния родителя
+    и откроет соединения при первом запросе.
+    """
+    for alias in connections:
+        del connections[alias]
+
+
+def start_pool(processes):
+    """ProcessPoolExecutor, процессы которого не делят соединений с родителем.
+
+    Соединение SQLite, закрытое в потомке явно или сборщиком мусора,
+    снимает блокировки файла и у родителя, поэтому родитель закрывает
+    свои соединения до fork. Процессы пула создаются при первой задаче:
+    пустая задача запускает их сразу, пока соединения закрыты.
+    """
+    connections.close_all()
+    pool = ProcessPoolExecutor(processes,
+                               initializer=reset_child_connections)
+    pool.submit(int).result()
+    return pool
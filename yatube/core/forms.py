@@ -0,0 +1,26 @@
+from django import forms
+
+from .profiling import FORMATS, view_choices
+
+
+class ProfilingForm(forms.Form):
+    views = forms.MultipleChoiceField(
+        label='Представления',
+        help_text='Запросы к каким view профилировать.',
+    )
+    percent = forms.FloatField(
+        label='Доля запросов, %', min_value=0.1, max_value=100, initial=1,
+    )
+    output = forms.ChoiceField(
+        label='Формат', choices=[(name, name) for name in FORMATS],
+        help_text='collapsed - для flame graph, pstats - для cProfile.',
+    )
+    minutes = forms.IntegerField(
+        label='Срок, минут', min_value=1, max_value=60, initial=10,
+        help_text='По истечении срока профилирование выключится само.',
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['views'].choices = [(name, name)
+                                        for name in view_choices()]
@@ -0,0 +1,74 @@
+import multiprocessing
+import random
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+
+def build_cache(config):
+    config = dict(config)
+    backend = import_string(config.pop('BACKEND'))
+    return backend(config.pop('LOCATION', ''), config)
+
+
+def run_worker(config, keys, requests, render_ms, seed):
+    """Один воркер: кэш-промах рендерит фрагмент, попадание - нет."""
+    cache = build_cache(config)
+    rng = random.Random(seed)
+    # Распределение Ципфа: первые страницы ленты читают чаще.
+    weights = [1 / rank for rank in range(1, keys + 1)]
+    hits = 0
+    for key in rng.choices(range(keys), weights, k=requests):
+        if cache.get(f'fragment:{key}') is not None:
+            hits += 1
+            continue
+        time.sleep(render_ms / 1000)
+        cache.set(f'fragment:{key}', 'x' * 4096, timeout=None)
+    return hits
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает долю попаданий в кэш фрагментов при нескольких '
+            'воркерах для разных бэкендов кэша.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backends', nargs='+',
+                            default=['locmem', 'sqlite'],
+                            choices=sorted(settings.CACHE_BACKENDS))
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Запросов на одного воркера.')
+        parser.add_argument('--keys', type=int, default=200,
+                            help='Число различных фрагментов.')
+        parser.add_argument('--render-ms', type=float, default=1.0,
+                            help='Цена рендеринга фрагмента при промахе.')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        requests = options['requests']
+        self.stdout.write(
+            f'{"backend":<10} {"hit rate":>9} {"renders":>8} {"seconds":>8}')
+        for name in options['backends']:
+            config = dict(settings.CACHE_BACKENDS[name])
+            with tempfile.TemporaryDirectory() as directory:
+                if name == 'sqlite':
+                    config['LOCATION'] = f'{directory}/cache.sqlite3'
+                try:
+                    build_cache(config).clear()
+                except Exception as error:
+                    raise CommandError(f'{name}: {error}')
+                started = time.monotonic()
+                with multiprocessing.Pool(workers) as pool:
+                    hits = sum(pool.starmap(run_worker, [
+                        (config, options['keys'], requests,
+                         options['render_ms'], seed)
+                        for seed in range(workers)
+                    ]))
+                elapsed = time.monotonic() - started
+            total = workers * requests
+            self.stdout.write(
+                f'{name:<10} {hits / total:>9.1%} {total - hits:>8} '
+                f'{elapsed:>8.2f}')
@@ -0,0 +1,58 @@
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Сводка журнала медленных запросов по отпечаткам запросов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log', default=settings.SLOW_QUERY_LOG,
+            help='Файл журнала; по умолчанию SLOW_QUERY_LOG.',
+        )
+        parser.add_argument(
+            '--top', type=int, default=10,
+            help='Сколько самых дорогих форм запросов показать.',
+        )
+        parser.add_argument(
+            '--sort', choices=('total', 'count', 'max'), default='total',
+            help='Порядок: суммарное время, число или худшее время.',
+        )
+
+    def handle(self, *args, **options):
+        if not options['log']:
+            raise CommandError('Журнал не задан: укажите --log '
+                               'или настройку SLOW_QUERY_LOG.')
+        groups = defaultdict(lambda: {'count': 0, 'total': 0.0, 'max': 0.0,
+                                      'views': set(), 'sql': '',
+                                      'plan': None})
+        try:
+            with open(options['log']) as log:
+                for line in log:
+                    entry = json.loads(line)
+                    group = groups[entry['fingerprint']]
+                    group['count'] += 1
+                    group['total'] += entry['duration_ms']
+                    group['max'] = max(group['max'], entry['duration_ms'])
+                    group['views'].add(entry['view'] or '-')
+                    group['sql'] = group['sql'] or entry['sql']
+                    group['plan'] = group['plan'] or entry.get('plan')
+        except FileNotFoundError:
+            raise CommandError(f'Нет файла {options["log"]}')
+        ordered = sorted(groups.items(),
+                         key=lambda item: item[1][options['sort']],
+                         reverse=True)
+        for shape, group in ordered[:options['top']]:
+            self.stdout.write(
+                f'{shape}  {group["count"]} раз, всего '
+                f'{group["total"]:.1f} мс, в среднем '
+                f'{group["total"] / group["count"]:.1f} мс, худший '
+                f'{group["max"]:.1f} мс; view: '
+                f'{", ".join(sorted(group["views"]))}')
+            self.stdout.write(f'    {group["sql"][:500]}')
+            for step in group['plan'] or ():
+                self.stdout.write(f'    plan: {step}')
+        self.stdout.write(f'Форм запросов: {len(groups)}')
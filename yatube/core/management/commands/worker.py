@@ -0,0 +1,90 @@
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.db import start_pool
+from core.tasks import claim, run
+
+
+def run_in_child(task_id):
+    # Соединения родителя закрыты до fork в start_pool,
+    # здесь закрываем только собственное соединение потомка.
+    try:
+        return run(task_id)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи локальной очереди пулом процессов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=settings.TASK_WORKER_PROCESSES,
+            help='Размер пула; 0 - выполнять в текущем процессе.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить всё, что готово сейчас, и выйти.',
+        )
+        parser.add_argument(
+            '--poll', type=float, default=1.0,
+            help='Пауза между опросами пустой очереди, секунд.',
+        )
+        parser.add_argument(
+            '--stats-every', type=float, default=60.0,
+            help='Как часто печатать метрики пропускной способности.',
+        )
+
+    def handle(self, *args, **options):
+        self.statuses = Counter()
+        self.durations = defaultdict(list)
+        self.started = time.monotonic()
+        processes = options['processes']
+        pool = None
+        if processes:
+            pool = start_pool(processes)
+        batch_size = max(processes, 1) * 2
+        last_stats = time.monotonic()
+        try:
+            while True:
+                task_ids = claim(batch_size)
+                if pool:
+                    results = list(pool.map(run_in_child, task_ids))
+                else:
+                    results = [run(task_id) for task_id in task_ids]
+                for name, status, duration in results:
+                    self.statuses[status] += 1
+                    self.durations[name].append(duration)
+                if time.monotonic() - last_stats >= options['stats_every']:
+                    self.report()
+                    last_stats = time.monotonic()
+                if not task_ids:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pool:
+                pool.shutdown()
+            self.report()
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        total = sum(self.statuses.values())
+        self.stdout.write(
+            f'Задач: {total} за {elapsed:.1f} с '
+            f'({total / elapsed if elapsed else 0:.1f}/с); '
+            f'выполнено {self.statuses["done"]}, '
+            f'повторов {self.statuses["pending"]}, '
+            f'ошибок {self.statuses["failed"]}'
+        )
+        for name, durations in sorted(self.durations.items()):
+            self.stdout.write(
+                f'  {name}: {len(durations)} шт., '
+                f'в среднем {sum(durations) / len(durations) * 1000:.0f} мс'
+            )
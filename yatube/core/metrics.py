@@ -0,0 +1,236 @@
+"""Лёгкие метрики запросов: время, база, шаблоны, кэш.
+
+MetricsMiddleware для каждого запроса считает общее время, время и число
+SQL-запросов (execute_wrapper), время отрисовки шаблонов и попадания в
+кэш. Итог уходит клиенту заголовком Server-Timing и копится в гистограммах
+по имени view, которые /metrics/ отдаёт в текстовом формате Prometheus.
+Гистограммы живут в памяти процесса: каждый воркер отдаёт свои.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template.base import Template
+
+_local = threading.local()
+_lock = threading.Lock()
+_missing = object()
+
+
+class RequestMetrics:
+    def __init__(self, request=None):
+        self.request = request
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.queries = 0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def current():
+    """Метрики текущего запроса или None вне MetricsMiddleware."""
+    return getattr(_local, 'metrics', None)
+
+
+def current_view():
+    """Имя view текущего запроса, если URL уже разобран."""
+    metrics = current()
+    match = metrics and getattr(metrics.request, 'resolver_match', None)
+    return match.view_name if match else None
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    """Накопленные по view гистограммы и счётчики."""
+
+    HISTOGRAMS = (
+        ('request_duration_seconds', 'Время обработки запроса.'),
+        ('db_duration_seconds', 'Время SQL-запросов за запрос.'),
+        ('template_duration_seconds', 'Время отрисовки шаблонов.'),
+    )
+    COUNTERS = (
+        ('db_queries_total', 'Число SQL-запросов.'),
+        ('cache_hits_total', 'Попадания в кэш.'),
+        ('cache_misses_total', 'Промахи кэша.'),
+    )
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.histograms = defaultdict(
+            lambda: Histogram(settings.METRICS_BUCKETS))
+        self.counters = defaultdict(int)
+
+    def record(self, view, metrics, duration):
+        with _lock:
+            self.histograms['request_duration_seconds', view].observe(
+                duration)
+            self.histograms['db_duration_seconds', view].observe(
+                metrics.db_time)
+            self.histograms['template_duration_seconds', view].observe(
+                metrics.template_time)
+            self.counters['db_queries_total', view] += metrics.queries
+            self.counters['cache_hits_total', view] += metrics.cache_hits
+            self.counters['cache_misses_total', view] += (
+                metrics.cache_misses)
+
+    def render(self):
+        """Текстовый формат экспозиции Prometheus 0.0.4."""
+        lines = []
+        with _lock:
+            for name, help_text in self.HISTOGRAMS:
+                lines += [f'# HELP yatube_{name} {help_text}',
+                          f'# TYPE yatube_{name} histogram']
+                for (metric, view), histogram in sorted(
+                        self.histograms.items()):
+                    if metric != name:
+                        continue
+                    label = f'view="{view}"'
+                    for bound, count in zip(histogram.buckets,
+                                            histogram.counts):
+                        lines.append(f'yatube_{name}_bucket'
+                                     f'{{{label},le="{bound}"}} {count}')
+                    lines += [
+                        f'yatube_{name}_bucket{{{label},le="+Inf"}} '
+                        f'{histogram.count}',
+                        f'yatube_{name}_sum{{{label}}} {histogram.total}',
+                        f'yatube_{name}_count{{{label}}} {histogram.count}',
+                    ]
+            for name, help_text in self.COUNTERS:
+                lines += [f'# HELP yatube_{name} {help_text}',
+                          f'# TYPE yatube_{name} counter']
+                for (metric, view), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(f'yatube_{name}{{view="{view}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def time_query(execute, sql, params, many, context):
+    metrics = current()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if metrics is not None:
+            metrics.db_time += time.perf_counter() - started
+            metrics.queries += 1
+
+
+def instrument_templates():
+    """Оборачивает Template.render; вложенные include не считаются дважды."""
+    render = Template.render
+    if getattr(render, 'instrumented', False):
+        return
+
+    @wraps(render)
+    def timed_render(self, context):
+        metrics = current()
+        if metrics is None:
+            return render(self, context)
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_time += time.perf_counter() - started
+
+    timed_render.instrumented = True
+    Template.render = timed_render
+
+
+def instrument_cache_class(backend_class):
+    """Считает попадания и промахи get/get_many у класса бэкенда кэша."""
+    if 'metrics_instrumented' in vars(backend_class):
+        return
+    get, get_many = backend_class.get, backend_class.get_many
+
+    @wraps(get)
+    def counted_get(self, key, default=None, version=None):
+        value = get(self, key, _missing, version)
+        metrics = current()
+        if metrics is not None:
+            if value is _missing:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return default if value is _missing else value
+
+    @wraps(get_many)
+    def counted_get_many(self, keys, version=None):
+        keys = list(keys)
+        metrics = current()
+        # Базовый get_many вызывает get: не считаем ключи дважды.
+        _local.metrics = None
+        try:
+            found = get_many(self, keys, version)
+        finally:
+            _local.metrics = metrics
+        if metrics is not None:
+            metrics.cache_hits += len(found)
+            metrics.cache_misses += len(keys) - len(found)
+        return found
+
+    backend_class.get = counted_get
+    backend_class.get_many = counted_get_many
+    backend_class.metrics_instrumented = True
+
+
+def server_timing(metrics, duration):
+    return ', '.join((
+        f'app;dur={duration * 1000:.1f}',
+        f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} q"',
+        f'tpl;dur={metrics.template_time * 1000:.1f}',
+        f'cache;desc="{metrics.cache_hits} hit {metrics.cache_misses} miss"',
+    ))
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrument_templates()
+        for alias in settings.CACHES:
+            instrument_cache_class(type(caches[alias]))
+
+    def __call__(self, request):
+        metrics = _local.metrics = RequestMetrics(request)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(time_query))
+                response = self.get_response(request)
+        finally:
+            _local.metrics = None
+        duration = time.perf_counter() - metrics.started
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        registry.record(view, metrics, duration)
+        response['Server-Timing'] = server_timing(metrics, duration)
+        return response
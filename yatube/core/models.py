@@ -0,0 +1,82 @@
+import json
+
+from django.db import models
+
+
+class Task(models.Model):
+    """Задача локальной очереди, выполняемой командой worker."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(
+        max_length=100,
+        verbose_name='Задача',
+    )
+    payload = models.TextField(
+        default='{}',
+        verbose_name='Аргументы (JSON)',
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Статус',
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Попыток',
+    )
+    max_attempts = models.PositiveIntegerField(
+        default=3,
+        verbose_name='Максимум попыток',
+    )
+    run_after = models.DateTimeField(
+        verbose_name='Не раньше',
+    )
+    locked_by = models.CharField(
+        max_length=36,
+        blank=True,
+        verbose_name='Воркер',
+    )
+    locked_until = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Аренда до',
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка',
+    )
+    duration = models.FloatField(
+        blank=True,
+        null=True,
+        verbose_name='Длительность, с',
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создана',
+    )
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('status', 'run_after'),
+                         name='task_status_run_after_idx'),
+        )
+        verbose_name_plural = 'Задачи'
+        verbose_name = 'Задача'
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
+
+    @property
+    def kwargs(self):
+        return json.loads(self.payload)
@@ -0,0 +1,180 @@
+"""Выборочное профилирование запросов на работающих воркерах.
+
+Администратор на странице /profiling/ выбирает view из posts, долю
+запросов в процентах, формат и срок. Настройка хранится в файле
+PROFILING_DIR/config.json, поэтому её видят все воркеры машины при любом
+бэкенде кэша, и сама выключается по истечении срока.
+ProfilingMiddleware перечитывает файл не чаще раза в PROFILING_REFRESH
+секунд и профилирует только выпавшие по жребию запросы.
+
+Форматы результата в PROFILING_DIR:
+- pstats (.prof) - cProfile, открывается snakeviz или gprof2dot;
+- collapsed (.folded) - стеки, снятые отдельным потоком каждые
+  PROFILING_INTERVAL секунд, для flamegraph.pl и speedscope. Кадры
+  отрисовки шаблонов подписаны именем шаблона.
+"""
+import cProfile
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.template.base import Template
+
+CONFIG_FILE = 'config.json'
+FORMATS = {'collapsed': 'folded', 'pstats': 'prof'}
+
+_lock = threading.Lock()
+_config = {'value': None, 'checked': None}
+
+
+def view_choices():
+    """Имена view из posts, которые можно профилировать."""
+    from posts.urls import app_name, urlpatterns
+    return [f'{app_name}:{pattern.name}' for pattern in urlpatterns]
+
+
+def config_path():
+    return os.path.join(settings.PROFILING_DIR, CONFIG_FILE)
+
+
+def enable(views, percent, output, seconds):
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    # Запись через временный файл: воркер не прочтёт половину JSON.
+    temporary = f'{config_path()}.{os.getpid()}'
+    with open(temporary, 'w') as config:
+        json.dump({'views': sorted(views), 'percent': percent,
+                   'output': output, 'until': time.time() + seconds}, config)
+    os.replace(temporary, config_path())
+    forget_config()
+
+
+def disable():
+    try:
+        os.remove(config_path())
+    except FileNotFoundError:
+        pass
+    forget_config()
+
+
+def read_config():
+    try:
+        with open(config_path()) as config:
+            value = json.load(config)
+    except (FileNotFoundError, ValueError):
+        return None
+    return value if value['until'] > time.time() else None
+
+
+def forget_config():
+    with _lock:
+        _config['checked'] = None
+
+
+def get_config():
+    """Текущая настройка; файл читается не чаще PROFILING_REFRESH секунд."""
+    now = time.monotonic()
+    with _lock:
+        checked = _config['checked']
+        if checked is not None and now - checked < settings.PROFILING_REFRESH:
+            return _config['value']
+    value = read_config()
+    with _lock:
+        _config['value'], _config['checked'] = value, now
+    return value
+
+
+def frame_name(frame):
+    code = frame.f_code
+    if code is Template._render.__code__:
+        template = frame.f_locals.get('self')
+        origin = getattr(template, 'origin', None)
+        return f'template:{getattr(origin, "template_name", None)}'
+    return f'{frame.f_globals.get("__name__", "?")}:{code.co_name}'
+
+
+class StackSampler:
+    """Раз в interval секунд снимает стек потока и считает одинаковые."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def runcall(self, function, *args, **kwargs):
+        self.thread.start()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self.stopped.set()
+            self.thread.join()
+
+    def dump(self, path):
+        with open(path, 'w') as output:
+            for stack, count in self.stacks.most_common():
+                output.write(f'{stack} {count}\n')
+
+
+def profile_path(view, output):
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    name = '{}-{}-{}-{}.{}'.format(
+        view.replace(':', '.'), time.strftime('%Y%m%d%H%M%S'),
+        os.getpid(), uuid.uuid4().hex[:8], FORMATS[output])
+    return os.path.join(settings.PROFILING_DIR, name)
+
+
+def recent_profiles(limit=20):
+    try:
+        names = os.listdir(settings.PROFILING_DIR)
+    except FileNotFoundError:
+        return []
+    extensions = tuple(f'.{extension}' for extension in FORMATS.values())
+    paths = [os.path.join(settings.PROFILING_DIR, name) for name in names
+             if name.endswith(extensions)]
+    return sorted(paths, key=os.path.getmtime, reverse=True)[:limit]
+
+
+class ProfilingMiddleware:
+    """Профилирует выбранные view; должен стоять последним в MIDDLEWARE."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        config = get_config()
+        view = request.resolver_match.view_name
+        if (config is None or view not in config['views']
+                or random.random() * 100 >= config['percent']):
+            return None
+        if config['output'] == 'pstats':
+            profiler = cProfile.Profile()
+        else:
+            profiler = StackSampler(threading.get_ident(),
+                                    settings.PROFILING_INTERVAL)
+        response = profiler.runcall(view_func, request,
+                                    *view_args, **view_kwargs)
+        if config['output'] == 'pstats':
+            profiler.dump_stats(profile_path(view, 'pstats'))
+        else:
+            profiler.dump(profile_path(view, 'collapsed'))
+        return response
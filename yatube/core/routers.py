@@ -0,0 +1,95 @@
+"""Маршрутизация чтения лент на реплики базы.
+
+ReplicaRoutingMiddleware решает, можно ли читать текущий запрос с реплики:
+только GET/HEAD к представлениям из REPLICA_VIEWS и только если клиент
+недавно ничего не записывал. После любой записи клиент получает cookie,
+и REPLICA_STICKY_SECONDS секунд его запросы читают основную базу -
+так он сразу видит свои изменения, даже если реплика отстаёт.
+
+Прочитанное с реплики может отставать от поколений в кэше, которые уже
+сдвинула запись, поэтому такие ответы и фрагменты не кладутся в общие
+кэши (replica_read()): иначе устаревшая версия осталась бы там под
+новым ключом до следующей записи.
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+
+STICKY_COOKIE = 'primary_until'
+
+_state = threading.local()
+
+
+def use_replicas(enabled):
+    _state.replicas = enabled
+    _state.wrote = False
+    _state.replica_read = False
+
+
+def wrote():
+    """Была ли в текущем запросе запись в основную базу."""
+    return getattr(_state, 'wrote', False)
+
+
+def replica_read():
+    """Читал ли текущий запрос хоть что-то с реплики."""
+    return getattr(_state, 'replica_read', False)
+
+
+class ReplicaRouter:
+    """Чтение - с реплики, если это разрешено для запроса, запись - в default.
+
+    Без настроенных DATABASE_REPLICAS всё идёт в default.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (settings.DATABASE_REPLICAS
+                and getattr(_state, 'replicas', False)
+                and not wrote()):
+            _state.replica_read = True
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        # Дальше в этом запросе читаем то, что только что записали.
+        _state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии основной базы, связи между ними допустимы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплик приходит вместе с репликацией.
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        use_replicas(False)
+        try:
+            response = self.get_response(request)
+            if wrote() or request.method not in ('GET', 'HEAD'):
+                sticky = settings.REPLICA_STICKY_SECONDS
+                response.set_cookie(STICKY_COOKIE,
+                                    str(int(time.time()) + sticky),
+                                    max_age=sticky, httponly=True)
+            return response
+        finally:
+            use_replicas(False)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        try:
+            sticky_until = int(request.COOKIES.get(STICKY_COOKIE, 0))
+        except ValueError:
+            sticky_until = 0
+        use_replicas(
+            request.method in ('GET', 'HEAD')
+            and request.resolver_match.view_name in settings.REPLICA_VIEWS
+            and sticky_until <= time.time()
+        )
@@ -0,0 +1,127 @@
+"""Журнал медленных SQL-запросов с планом выполнения.
+
+Включается настройкой SLOW_QUERY_LOG - путём к файлу журнала;
+SlowQueryMiddleware на время запроса оборачивает им все соединения
+через connection.execute_wrapper(). Каждый запрос дольше
+SLOW_QUERY_THRESHOLD_MS дописывается строкой JSON: время, view, текст,
+отпечаток, параметры без значений строк. Для каждой новой формы запроса
+(отпечатка) один раз на процесс снимается EXPLAIN QUERY PLAN. Сводку по
+отпечаткам печатает команда slow_queries.
+"""
+import datetime
+import hashlib
+import json
+import re
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import current_view
+
+_local = threading.local()
+_lock = threading.Lock()
+_explained = set()
+
+LITERALS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def normalize(sql):
+    """Форма запроса: литералы и параметры заменены, списки IN свёрнуты."""
+    for pattern, replacement in LITERALS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def fingerprint(sql):
+    return hashlib.md5(normalize(sql).encode()).hexdigest()[:12]
+
+
+def redact(value):
+    """Числа и даты оставляем, строки и байты заменяем длиной."""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, (str, bytes)):
+        return f'<{type(value).__name__}:{len(value)}>'
+    return f'<{type(value).__name__}>'
+
+
+def explain(connection, sql, params):
+    if connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        prefix = 'EXPLAIN '
+    _local.explaining = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return [' '.join(str(column) for column in row)
+                    for row in cursor.fetchall()]
+    except Exception as error:
+        return [f'EXPLAIN не выполнен: {error}']
+    finally:
+        _local.explaining = False
+
+
+def log_slow_query(execute, sql, params, many, context):
+    """execute_wrapper: пишет в журнал запросы дольше порога."""
+    if getattr(_local, 'explaining', False):
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = (time.perf_counter() - started) * 1000
+        if duration >= settings.SLOW_QUERY_THRESHOLD_MS:
+            record(context['connection'], sql, params, many, duration)
+
+
+def record(connection, sql, params, many, duration):
+    shape = fingerprint(sql)
+    entry = {
+        'time': datetime.datetime.utcnow().isoformat(),
+        'duration_ms': round(duration, 3),
+        'view': current_view(),
+        'alias': connection.alias,
+        'fingerprint': shape,
+        'sql': sql,
+        'params': ([] if many or params is None
+                   else [redact(value) for value in params]),
+    }
+    with _lock:
+        first = shape not in _explained
+        _explained.add(shape)
+    if first and not many and sql.lstrip().upper().startswith('SELECT'):
+        entry['plan'] = explain(connection, sql, params)
+    with _lock, open(settings.SLOW_QUERY_LOG, 'a') as log:
+        log.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+
+class SlowQueryMiddleware:
+    """Пишет медленные запросы, если задан SLOW_QUERY_LOG.
+
+    Стоит сразу после MetricsMiddleware: обёртки снимаются в обратном
+    порядке, и каждая убирает из execute_wrappers именно себя.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.SLOW_QUERY_LOG:
+            return self.get_response(request)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(log_slow_query))
+            return self.get_response(request)
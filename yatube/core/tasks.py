@@ -0,0 +1,107 @@
+"""Локальная очередь задач в таблице базы данных, без брокера.
+
+Задачи регистрируются декоратором task в модулях tasks.py приложений
+и ставятся в очередь через enqueue(). Выполняет их команда
+`manage.py worker` пулом процессов.
+"""
+import json
+import time
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Task
+
+registry = {}
+
+
+def task(name):
+    """Регистрирует функцию как задачу очереди под именем name."""
+    def decorator(func):
+        registry[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, max_attempts=None, delay=0, **kwargs):
+    """Ставит задачу в очередь; delay откладывает первый запуск."""
+    if name not in registry:
+        raise KeyError(f'Неизвестная задача: {name}')
+    new_task = Task(
+        name=name,
+        payload=json.dumps(kwargs),
+        max_attempts=max_attempts or settings.TASK_MAX_ATTEMPTS,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+    new_task.save()
+    return new_task
+
+
+def claim(batch_size, lease=None):
+    """Забирает пачку готовых задач в аренду и возвращает их id.
+
+    UPDATE выполняется только для строк, которые всё ещё свободны,
+    поэтому два воркера не получат одну и ту же задачу. Задачи упавшего
+    воркера возвращаются в работу по истечении аренды.
+    """
+    now = timezone.now()
+    token = str(uuid.uuid4())
+    ready = (
+        Q(status=Task.PENDING, run_after__lte=now)
+        | Q(status=Task.RUNNING, locked_until__lt=now)
+    )
+    ids = list(Task.objects.filter(ready).order_by(
+        'run_after', 'pk'
+    ).values_list('pk', flat=True)[:batch_size])
+    if not ids:
+        return []
+    Task.objects.filter(ready, pk__in=ids).update(
+        status=Task.RUNNING,
+        locked_by=token,
+        locked_until=now + timedelta(
+            seconds=lease or settings.TASK_LEASE_SECONDS),
+    )
+    return list(Task.objects.filter(
+        locked_by=token, status=Task.RUNNING,
+    ).values_list('pk', flat=True))
+
+
+def retry_delay(attempts):
+    return settings.TASK_RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def run(task_id):
+    """Выполняет задачу; при ошибке планирует повтор с нарастающей паузой.
+
+    Возвращает (имя задачи, статус, длительность) для метрик воркера.
+    """
+    current = Task.objects.get(pk=task_id)
+    current.attempts += 1
+    started = time.monotonic()
+    try:
+        with transaction.atomic():
+            registry[current.name](**current.kwargs)
+    except Exception:
+        current.last_error = traceback.format_exc()
+        if current.attempts < current.max_attempts:
+            current.status = Task.PENDING
+            current.run_after = timezone.now() + timedelta(
+                seconds=retry_delay(current.attempts))
+        else:
+            current.status = Task.FAILED
+    else:
+        current.status = Task.DONE
+        current.last_error = ''
+    current.duration = time.monotonic() - started
+    current.locked_by = ''
+    current.locked_until = None
+    current.save(update_fields=(
+        'attempts', 'status', 'run_after', 'last_error', 'duration',
+        'locked_by', 'locked_until',
+    ))
+    return current.name, current.status, current.duration
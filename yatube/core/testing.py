@@ -0,0 +1,24 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """Проверка «не больше N запросов» для TestCase.
+
+    В отличие от assertNumQueries, бюджет - верхняя граница, а при
+    превышении в сообщении перечислены все выполненные запросы.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget, using=DEFAULT_DB_ALIAS):
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        if len(context) > budget:
+            queries = '\n'.join(
+                f'{number}. {query["sql"]}'
+                for number, query in enumerate(context.captured_queries, 1)
+            )
+            self.fail(f'{len(context)} запросов при бюджете {budget}:\n'
+                      f'{queries}')
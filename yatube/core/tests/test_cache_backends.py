@@ -0,0 +1,86 @@
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from ..cache_backends.sqlite import SQLiteCache
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.location = f'{self.directory.name}/cache.sqlite3'
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_basic_operations(self):
+        """get/set/add/incr/delete работают как у встроенных бэкендов."""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        self.assertEqual(self.cache.get_many(['key', 'counter', 'none']),
+                         {'key': {'value': 1}, 'counter': 6})
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        with self.assertRaises(ValueError):
+            self.cache.incr('key')
+
+    def test_expired_values_are_not_served(self):
+        """Истёкший ключ не отдаётся и освобождает место для add."""
+        self.cache.set('key', 'value', timeout=0)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'fresh'))
+        self.assertEqual(self.cache.get('key'), 'fresh')
+
+    def test_shared_between_instances(self):
+        """Два экземпляра на одном файле (два воркера) видят общие данные."""
+        other = self.make_cache()
+        self.cache.set('fragment', 'html')
+        self.assertEqual(other.get('fragment'), 'html')
+        self.cache.add('generation', 1)
+        other.incr('generation')
+        self.assertEqual(self.cache.incr('generation'), 3)
+
+    def test_least_recently_used_evicted(self):
+        """При переполнении вытесняются давно не читавшиеся ключи."""
+        cache = self.make_cache(MAX_ENTRIES=3, CULL_FREQUENCY=2,
+                                CULL_EVERY=1)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+            time.sleep(0.01)
+        cache._connection().execute(
+            'UPDATE cache SET accessed = ? WHERE key = ?',
+            (time.time(), cache.make_key('a')),
+        )
+        cache.set('d', 'd')
+        self.assertEqual(cache.get('a'), 'a')
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNone(cache.get('c'))
+        self.assertEqual(cache.get('d'), 'd')
+
+    def test_cull_checked_every_n_writes(self):
+        """Число ключей считается раз в CULL_EVERY записей, а не каждый раз."""
+        cache = self.make_cache(MAX_ENTRIES=2, CULL_FREQUENCY=2,
+                                CULL_EVERY=3)
+
+        def count():
+            return cache._connection().execute(
+                'SELECT COUNT(*) FROM cache').fetchone()[0]
+
+        cache.set('a', 'a')
+        cache.set('b', 'b')
+        self.assertEqual(count(), 2)
+        cache.set('c', 'c')
+        self.assertEqual(count(), 2)
+        cache.set_many({'d': 'd', 'e': 'e'})
+        cache.add('f', 'f')
+        self.assertEqual(count(), 5)
+        cache.set('g', 'g')
+        self.assertEqual(count(), 3)
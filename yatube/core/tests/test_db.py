@@ -0,0 +1,81 @@
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.test import SimpleTestCase, override_settings
+
+
+class SqlitePragmasTest(SimpleTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+
+    def open_connection(self):
+        wrapper = connections['default'].__class__(
+            dict(connections['default'].settings_dict,
+                 NAME=os.path.join(self.tmp_dir, 'db.sqlite3')),
+            alias='pragmas',
+        )
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    @override_settings(SQLITE_PRAGMAS={'journal_mode': 'WAL',
+                                       'synchronous': 'NORMAL',
+                                       'cache_size': -2000})
+    def test_pragmas_applied_on_connect(self):
+        """Новое соединение сразу получает PRAGMA из настроек."""
+        wrapper = self.open_connection()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -2000)
+
+    def test_no_pragmas_by_default(self):
+        wrapper = self.open_connection()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+
+
+class ProductionSettingsTest(SimpleTestCase):
+    def load(self, **environ):
+        environ.setdefault('DJANGO_SECRET_KEY', 'secret')
+        with mock.patch.dict(os.environ, environ):
+            sys.modules.pop('yatube.settings_production', None)
+            module = importlib.import_module('yatube.settings_production')
+        self.addCleanup(sys.modules.pop, 'yatube.settings_production', None)
+        return module
+
+    def test_process_local_cache_rejected(self):
+        """Кэш в памяти процесса в бою сломал бы сброс кэшей."""
+        with self.assertRaises(ImproperlyConfigured):
+            self.load(CACHE_BACKEND='locmem')
+
+    def test_profile_from_environment(self):
+        """Боевые настройки читают окружение и убирают отладку."""
+        prod = self.load(DJANGO_ALLOWED_HOSTS='yatube.ru, www.yatube.ru',
+                         DATABASE_CONN_MAX_AGE='60')
+        self.assertFalse(prod.DEBUG)
+        self.assertEqual(prod.ALLOWED_HOSTS, ['yatube.ru', 'www.yatube.ru'])
+        self.assertEqual(prod.DATABASES['default']['CONN_MAX_AGE'], 60)
+        self.assertEqual(prod.SQLITE_PRAGMAS['journal_mode'], 'WAL')
+        self.assertNotIn('debug_toolbar', prod.INSTALLED_APPS)
+        self.assertFalse(any('debug_toolbar' in middleware
+                             for middleware in prod.MIDDLEWARE))
+        loaders = prod.TEMPLATES[0]['OPTIONS']['loaders']
+        self.assertEqual(loaders[0][0],
+                         'django.template.loaders.cached.Loader')
+        self.assertFalse(prod.TEMPLATES[0]['APP_DIRS'])
+        self.assertEqual(prod.CACHES['default']['BACKEND'],
+                         'core.cache_backends.sqlite.SQLiteCache')
+        # Настройки разработки не изменились.
+        self.assertIn('debug_toolbar', settings.INSTALLED_APPS)
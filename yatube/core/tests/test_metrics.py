@@ -0,0 +1,62 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from core.metrics import registry
+from posts.models import Post
+
+User = get_user_model()
+
+
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='Pelevin')
+        Post.objects.create(author=cls.user, text='Чапаев')
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+
+    def test_server_timing_header(self):
+        """Ответ несёт время view, базы, шаблонов и статистику кэша."""
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        queries = int(re.search(r'db;dur=[\d.]+;desc="(\d+) q"',
+                                timing).group(1))
+        self.assertGreater(queries, 0)
+        self.assertRegex(timing, r'app;dur=[\d.]+')
+        self.assertRegex(timing, r'tpl;dur=[\d.]+')
+        self.assertRegex(timing, r'cache;desc="\d+ hit [1-9]\d* miss"')
+
+        # Второй запрос берёт страницу из кэша: без SQL и шаблонов.
+        timing = self.client.get(reverse('posts:index'))['Server-Timing']
+        self.assertIn('desc="0 q"', timing)
+        self.assertIn('tpl;dur=0.0', timing)
+
+    def test_prometheus_endpoint(self):
+        """/metrics/ отдаёт гистограммы по именам view."""
+        for _ in range(3):
+            self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'],
+                         'text/plain; version=0.0.4')
+        body = response.content.decode()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram',
+                      body)
+        self.assertIn('yatube_request_duration_seconds_count'
+                      '{view="posts:index"} 3', body)
+        self.assertIn('yatube_request_duration_seconds_bucket'
+                      '{view="posts:index",le="+Inf"} 3', body)
+        self.assertRegex(body,
+                         r'yatube_db_queries_total\{view="posts:index"\} '
+                         r'[1-9]')
+        self.assertIn('yatube_cache_hits_total{view="posts:index"}', body)
+
+    def test_endpoint_is_local_only(self):
+        response = self.client.get(reverse('metrics'),
+                                   REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,118 @@
+import os
+import pstats
+import shutil
+import sys
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template import Context, Origin, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import profiling
+
+User = get_user_model()
+
+
+def iter_frames():
+    frame = sys._getframe(1)
+    while frame is not None:
+        yield frame
+        frame = frame.f_back
+
+
+class ProfilingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', is_staff=True)
+        cls.user = User.objects.create_user('user')
+
+    def setUp(self):
+        cache.clear()
+        profiling.forget_config()
+        self.addCleanup(profiling.forget_config)
+        self.tmp_dir = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        override = override_settings(PROFILING_DIR=self.tmp_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def profiles(self):
+        return sorted(os.path.basename(path)
+                      for path in profiling.recent_profiles())
+
+    def test_page_is_staff_only(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('profiling'))
+        self.assertEqual(response.status_code, 302)
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('profiling'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_enable_and_disable_from_page(self):
+        self.client.force_login(self.admin)
+        self.client.post(reverse('profiling'), {
+            'views': ['posts:index'], 'percent': 50,
+            'output': 'pstats', 'minutes': 5,
+        })
+        config = profiling.get_config()
+        self.assertEqual(config['views'], ['posts:index'])
+        self.assertEqual(config['percent'], 50)
+        self.client.post(reverse('profiling'), {'disable': ''})
+        self.assertIsNone(profiling.get_config())
+
+    def test_config_shared_through_file(self):
+        """Настройку видят другие процессы: она в файле, а не в кэше."""
+        profiling.enable(['posts:index'], 10, 'pstats', 60)
+        cache.clear()
+        profiling.forget_config()
+        self.assertEqual(profiling.get_config()['percent'], 10)
+        with mock.patch('core.profiling.time.time',
+                        return_value=time.time() + 61):
+            profiling.forget_config()
+            self.assertIsNone(profiling.get_config())
+
+    def test_only_chosen_views_profiled(self):
+        """Профиль пишется для выбранного view и не пишется для других."""
+        profiling.enable(['posts:index'], 100, 'pstats', 60)
+        self.client.get(reverse('posts:search'))
+        self.assertEqual(self.profiles(), [])
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+        name, = self.profiles()
+        self.assertTrue(name.startswith('posts.index-'))
+        stats = pstats.Stats(os.path.join(self.tmp_dir, name))
+        self.assertTrue(any(function == 'index'
+                            for _, _, function in stats.stats))
+
+    def test_collapsed_stacks_written(self):
+        profiling.enable(['posts:index'], 100, 'collapsed', 60)
+        self.client.get(reverse('posts:index'))
+        name, = self.profiles()
+        self.assertTrue(name.endswith('.folded'))
+        with open(os.path.join(self.tmp_dir, name)) as output:
+            for line in output:
+                self.assertRegex(line, r'^\S+(;\S+)* \d+$')
+
+    def test_template_frames_named(self):
+        """В стеках кадры отрисовки шаблона подписаны его именем."""
+        names = []
+        template = Template(
+            '{{ probe }}', origin=Origin('probe', template_name='probe.html'))
+        template.render(Context({'probe': lambda: names.extend(
+            profiling.frame_name(frame) for frame in iter_frames())}))
+        self.assertIn('template:probe.html', names)
+        self.assertIn('django.template.base:render', names)
+
+    def test_percent_samples_requests(self):
+        profiling.enable(['posts:index'], 40, 'pstats', 60)
+        with mock.patch('core.profiling.random.random', return_value=0.5):
+            self.client.get(reverse('posts:index'))
+        self.assertEqual(self.profiles(), [])
+        with mock.patch('core.profiling.random.random', return_value=0.3):
+            self.client.get(reverse('posts:index'))
+        self.assertEqual(len(self.profiles()), 1)
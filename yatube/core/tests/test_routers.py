@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.routers import STICKY_COOKIE
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(TestCase):
+    """Основная база - тестовая, реплика - отдельный файл SQLite.
+
+    Реплика получает только схему и не получает записей, поэтому по
+    данным ответа видно, из какой базы читало представление.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp_dir = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        connections.databases['replica'] = dict(
+            connections['default'].settings_dict,
+            NAME=os.path.join(cls.tmp_dir, 'replica.sqlite3'))
+        with override_settings(DATABASE_REPLICAS=[]):
+            call_command('migrate', database='replica', verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.databases['replica']
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='Bulgakov')
+        self.writer = self.client_class()
+        self.writer.force_login(self.user)
+
+    def test_reads_go_to_replica_and_writes_to_primary(self):
+        """Лента читается с реплики, новая запись уходит в основную базу."""
+        response = self.writer.post(reverse('posts:create'),
+                                    {'text': 'Маргарита'})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Post.objects.filter(text='Маргарита').exists())
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_writer_reads_own_writes(self):
+        """После записи автор какое-то время читает основную базу."""
+        response = self.writer.post(reverse('posts:create'),
+                                    {'text': 'Маргарита'})
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        url = reverse('posts:profile', kwargs={'username': 'Bulgakov'})
+        response = self.writer.get(url)
+        self.assertEqual(
+            [post.text for post in response.context['page_obj']],
+            ['Маргарита'])
+
+        self.writer.cookies.pop(STICKY_COOKIE)
+        self.assertEqual(self.writer.get(url).status_code, 404)
+
+    def test_replica_reads_not_cached(self):
+        """Отставшая реплика не оставляет в кэше устаревшую страницу."""
+        Post.objects.create(author=self.user, text='Мастер')
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+        self.assertFalse(response.has_header('ETag'))
+        # Реплика догнала основную базу.
+        with override_settings(DATABASE_REPLICAS=[]):
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Мастер')
+
+    def test_other_views_read_primary(self):
+        post = Post.objects.create(author=self.user, text='Воланд')
+        response = self.writer.get(
+            reverse('posts:edit', kwargs={'post_id': post.id}))
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,93 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import slow_queries
+
+User = get_user_model()
+
+
+class SlowQueryLogTest(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, tmp_dir, ignore_errors=True)
+        self.log = os.path.join(tmp_dir, 'slow.log')
+        slow_queries._explained.clear()
+
+    def entries(self):
+        with open(self.log) as log:
+            return [json.loads(line) for line in log]
+
+    def test_fingerprint_ignores_literals(self):
+        self.assertEqual(
+            slow_queries.fingerprint('SELECT * FROM t WHERE id IN (1, 2, 3)'),
+            slow_queries.fingerprint("SELECT *  FROM t WHERE id IN (%s)"),
+        )
+        self.assertNotEqual(slow_queries.fingerprint('SELECT a FROM t'),
+                            slow_queries.fingerprint('SELECT b FROM t'))
+
+    def test_slow_queries_logged_with_plan_once(self):
+        """Параметры-строки скрыты, план снимается один раз на форму."""
+        with override_settings(SLOW_QUERY_LOG=self.log,
+                               SLOW_QUERY_THRESHOLD_MS=0):
+            with connection.execute_wrapper(slow_queries.log_slow_query):
+                list(User.objects.filter(username='secret_name'))
+                list(User.objects.filter(username='other_name'))
+        first, second = self.entries()
+        self.assertEqual(first['fingerprint'], second['fingerprint'])
+        self.assertEqual(first['params'], ['<str:11>'])
+        self.assertNotIn('secret_name', json.dumps(first))
+        self.assertTrue(first['plan'])
+        self.assertNotIn('plan', second)
+
+    def test_threshold(self):
+        with override_settings(SLOW_QUERY_LOG=self.log,
+                               SLOW_QUERY_THRESHOLD_MS=10 ** 6):
+            with connection.execute_wrapper(slow_queries.log_slow_query):
+                list(User.objects.all())
+        self.assertFalse(os.path.exists(self.log))
+
+    def test_middleware_logs_every_request(self):
+        """Журнал через middleware: обёртки снимаются, view записан."""
+        counts = []
+        # Прогрев: первый запрос поиска заполняет кэш частот слов.
+        self.client.get(reverse('posts:search'), {'q': 'текст'})
+        with override_settings(SLOW_QUERY_LOG=self.log,
+                               SLOW_QUERY_THRESHOLD_MS=0):
+            for _ in range(3):
+                connection.close()
+                response = self.client.get(reverse('posts:search'),
+                                           {'q': 'текст'})
+                counts.append(int(re.search(
+                    r'desc="(\d+) q"', response['Server-Timing']).group(1)))
+                self.assertEqual(connection.execute_wrappers, [])
+        # В первом запросе Server-Timing учитывает и сами EXPLAIN.
+        self.assertEqual(counts[1], counts[2])
+        entries = self.entries()
+        plans = sum('plan' in entry for entry in entries)
+        self.assertTrue(plans)
+        self.assertEqual(counts[0], counts[1] + plans)
+        self.assertEqual([entry['view'] for entry in entries],
+                         ['posts:search'] * (sum(counts) - plans))
+
+    def test_summary_command(self):
+        with override_settings(SLOW_QUERY_LOG=self.log,
+                               SLOW_QUERY_THRESHOLD_MS=0):
+            with connection.execute_wrapper(slow_queries.log_slow_query):
+                for _ in range(3):
+                    list(User.objects.filter(pk=1))
+        out = StringIO()
+        call_command('slow_queries', log=self.log, stdout=out)
+        shape = self.entries()[0]['fingerprint']
+        self.assertIn(f'{shape}  3 раз', out.getvalue())
+        self.assertIn('plan:', out.getvalue())
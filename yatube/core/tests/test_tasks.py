@@ -0,0 +1,57 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import Task
+from ..tasks import claim, enqueue, registry, task
+
+calls = []
+
+
+@task('core.tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task('core.tests.fail')
+def fail():
+    raise RuntimeError('сломалось')
+
+
+@override_settings(TASK_RETRY_DELAY=0)
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def work(self):
+        call_command('worker', once=True, processes=0, stdout=StringIO())
+
+    def test_worker_runs_queued_tasks(self):
+        """worker выполняет задачи и отмечает их выполненными."""
+        enqueue('core.tests.record', value=1)
+        enqueue('core.tests.record', value=2)
+        self.work()
+        self.assertEqual(sorted(calls), [1, 2])
+        self.assertEqual(
+            Task.objects.filter(status=Task.DONE).count(), 2)
+
+    def test_failed_task_retried_until_max_attempts(self):
+        """Упавшая задача повторяется и после лимита помечается ошибкой."""
+        failed = enqueue('core.tests.fail', max_attempts=2)
+        self.work()
+        failed.refresh_from_db()
+        self.assertEqual(failed.status, Task.FAILED)
+        self.assertEqual(failed.attempts, 2)
+        self.assertIn('сломалось', failed.last_error)
+
+    def test_claimed_task_not_given_twice(self):
+        """Задача в аренде не достаётся второму воркеру."""
+        enqueue('core.tests.record', value=1)
+        self.assertEqual(len(claim(10)), 1)
+        self.assertEqual(claim(10), [])
+
+    def test_unknown_task_rejected(self):
+        self.assertNotIn('core.tests.missing', registry)
+        with self.assertRaises(KeyError):
+            enqueue('core.tests.missing')
@@ -1,4 +1,13 @@
-from django.shortcuts import render
+import os
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse
+from django.shortcuts import redirect, render
+
+from . import profiling
+from .forms import ProfilingForm
+from .metrics import registry
 
 
 def page_not_found(request, exception):
@@ -15,3 +24,32 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics(request):
+    # Метрики только для локального сборщика, остальным - 404.
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
+
+
+@staff_member_required
+def profiling_settings(request):
+    if request.method == 'POST' and 'disable' in request.POST:
+        profiling.disable()
+        return redirect('profiling')
+    form = ProfilingForm(request.POST or None)
+    if form.is_valid():
+        profiling.enable(form.cleaned_data['views'],
+                         form.cleaned_data['percent'],
+                         form.cleaned_data['output'],
+                         form.cleaned_data['minutes'] * 60)
+        return redirect('profiling')
+    return render(request, 'core/profiling.html', {
+        'form': form,
+        'config': profiling.get_config(),
+        'profiles': [os.path.basename(path)
+                     for path in profiling.recent_profiles()],
+        'profiling_dir': settings.PROFILING_DIR,
+    })
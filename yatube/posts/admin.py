@@ -1,10 +1,86 @@
+from django.conf import settings
 from django.contrib import admin
+from django.db.models import Q
 
-from .models import Post, Group, Comment, Follow
+from .models import (Comment, CommentToken, Follow, Group, Post, PostToken,
+                     UserStats)
+from .search import matching, tokenize
+
+
+class TokenSearchMixin:
+    """Поиск в списке объектов через инвертированный индекс.
+
+    Вместо LIKE '%...%' по всей таблице ищутся объекты, содержащие все
+    слова запроса, плюс точное совпадение имени автора.
+    """
+
+    token_model = None
+    token_owner = None
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        query = Q(author__username=search_term)
+        tokens = tokenize(search_term)
+        if tokens:
+            query |= Q(pk__in=matching(self.token_model.objects.all(),
+                                       self.token_owner, tokens))
+        return queryset.filter(query), False
+
+
+class BoundedFacetFilter(admin.SimpleListFilter):
+    """Фасет, список вариантов которого ограничен ADMIN_FACET_LIMIT.
+
+    Варианты берутся одним запросом с LIMIT к небольшой таблице,
+    а не через DISTINCT по всем строкам списка. По умолчанию это
+    модель, на которую ссылается поле parameter_name, с подписью
+    label_field в порядке ordering; подклассы с другим источником
+    переопределяют choices_queryset.
+    """
+
+    label_field = 'pk'
+    ordering = ('pk',)
+
+    def choices_queryset(self, model_admin):
+        """Пары (pk, подпись) в порядке показа."""
+        related = model_admin.model._meta.get_field(
+            self.parameter_name).related_model
+        return related.objects.order_by(*self.ordering).values_list(
+            'pk', self.label_field)
+
+    def lookups(self, request, model_admin):
+        return [
+            (str(pk), label) for pk, label in
+            self.choices_queryset(model_admin)[:settings.ADMIN_FACET_LIMIT]
+        ]
+
+    def queryset(self, request, queryset):
+        if self.value() and self.value().isdigit():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+
+class GroupFacet(BoundedFacetFilter):
+    title = 'группа'
+    parameter_name = 'group'
+    label_field = 'title'
+    ordering = ('title',)
+
+
+class AuthorFacet(BoundedFacetFilter):
+    title = 'автор (самые активные)'
+    parameter_name = 'author'
+
+    def choices_queryset(self, model_admin):
+        # Самые активные авторы - по счётчикам, а не по таблице User.
+        return UserStats.objects.order_by(
+            '-posts_count'
+        ).values_list('user_id', 'user__username')
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(TokenSearchMixin, admin.ModelAdmin):
     list_display = (
         'pk',
         'text',
@@ -13,9 +89,13 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
-    list_filter = ('pub_date',)
+    list_filter = ('pub_date', GroupFacet, AuthorFacet)
+    show_full_result_count = False
     empty_value_display = '-пусто-'
+    token_model = PostToken
+    token_owner = 'post'
 
 
 @admin.register(Group)
@@ -31,10 +111,14 @@ class GroupAdmin(admin.ModelAdmin):
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(TokenSearchMixin, admin.ModelAdmin):
     list_display = ('post', 'author', 'text', 'created')
-    list_filter = ('text', 'created')
-    search_fields = ('post', 'author', 'text')
+    list_select_related = ('post', 'author')
+    list_filter = ('created', AuthorFacet)
+    search_fields = ('text',)
+    show_full_result_count = False
+    token_model = CommentToken
+    token_owner = 'comment'
 
 
 @admin.register(Follow)
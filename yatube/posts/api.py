@@ -0,0 +1,91 @@
+"""Версионированный JSON API лент только для чтения.
+
+Ответ помечается ETag из поколения ленты (posts.generations) и курсора:
+поколение сдвигается при любом создании, правке и удалении поста, поэтому
+для неизменной страницы 304 отдаётся без запроса к ленте.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition, require_GET
+
+from .conditional import author_pk, etag_for, group_pk
+from .models import Group, Post
+from .paginators import CursorPaginator
+
+User = get_user_model()
+
+API_VERSION = 'v1'
+
+
+def serialize_post(post):
+    image = None
+    if post.image:
+        image = post.thumbnail_urls.get('card') or post.image.url
+    return {
+        'id': post.id,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': image,
+    }
+
+
+def feed_response(request, posts):
+    paginator = CursorPaginator(
+        posts.select_related('author', 'group').only(
+            'id', 'text', 'pub_date', 'image', 'thumbnails', 'group_id',
+            'author__username', 'group__slug'),
+        settings.NUMBER_POSTS,
+    )
+    page = paginator.get_page(request.GET.get('after'),
+                              request.GET.get('before'))
+    return JsonResponse(
+        {
+            'results': [serialize_post(post) for post in page],
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+        },
+        json_dumps_params={'ensure_ascii': False,
+                           'separators': (',', ':')},
+    )
+
+
+def feed_etag(scope, lookup=None):
+    """etag_func для condition(): поколение области плюс курсор.
+
+    lookup находит pk области по аргументам URL одним запросом
+    по уникальному полю; если объекта нет, ETag не ставится и view
+    отвечает 404.
+    """
+    def etag(request, **kwargs):
+        pk = None
+        if lookup is not None:
+            pk = lookup(*kwargs.values())
+            if pk is None:
+                return None
+        return etag_for(request, (scope, pk),
+                        salt=f'{API_VERSION}:{settings.NUMBER_POSTS}')
+    return etag
+
+
+@require_GET
+@condition(etag_func=feed_etag('global'))
+def index(request):
+    return feed_response(request, Post.objects.all())
+
+
+@require_GET
+@condition(etag_func=feed_etag('group', group_pk))
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, group.posts.all())
+
+
+@require_GET
+@condition(etag_func=feed_etag('author', author_pk))
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, author.posts.all())
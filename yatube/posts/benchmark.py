@@ -0,0 +1,287 @@
+"""Наполнение базы тестовыми данными и замеры представлений.
+
+seed() создаёт пользователей и группы через mixer, а посты, комментарии
+и подписки - пачками через bulk_create с текстами от Faker; производные
+данные (счётчики, поисковый индекс, ленты подписок) затем пересчитываются
+теми же функциями, что и команды обслуживания.
+"""
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections
+from django.db.models import Max
+from django.template import engines
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import mixer
+
+from . import timeline
+from .cards import CARD_TEMPLATE, render_cards
+from .counters import rebuild_comments_counts, rebuild_user_stats
+from .models import Comment, Follow, Group, Post
+from .search import rebuild_comment_index, rebuild_post_index
+
+User = get_user_model()
+
+USERNAME = 'bench_{}'
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def seed(users=100, groups=10, posts=10000, comments=20000, follows=1000,
+         random_seed=0, batch_size=1000):
+    """Создаёт набор данных; возвращает число созданных объектов."""
+    rng = random.Random(random_seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(random_seed)
+    offset = User.objects.filter(username__startswith='bench_').count()
+    authors = mixer.cycle(users).blend(
+        User,
+        username=(USERNAME.format(offset + number)
+                  for number in range(users)),
+        first_name=fake.first_name,
+        last_name=fake.last_name,
+    )
+    author_ids = [author.pk for author in authors]
+    group_ids = [group.pk for group in mixer.cycle(groups).blend(
+        Group, title=fake.catch_phrase, description=fake.sentence)]
+
+    # bulk_create в SQLite не возвращает pk, новые строки ищем по pk.
+    last_post = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+    for batch in chunks(range(posts), batch_size):
+        Post.objects.bulk_create(
+            Post(text=fake.text(rng.randint(50, 600)),
+                 author_id=rng.choice(author_ids),
+                 group_id=(rng.choice(group_ids)
+                           if group_ids and rng.random() < 0.7 else None))
+            for _ in batch
+        )
+    post_ids = list(Post.objects.filter(
+        pk__gt=last_post).order_by('pk').values_list('pk', flat=True))
+    for batch in chunks(post_ids, batch_size):
+        rebuild_post_index(batch)
+
+    last_comment = Comment.objects.aggregate(last=Max('pk'))['last'] or 0
+    for batch in chunks(range(comments if post_ids else 0), batch_size):
+        Comment.objects.bulk_create(
+            Comment(text=fake.sentence(rng.randint(3, 20)),
+                    post_id=rng.choice(post_ids),
+                    author_id=rng.choice(author_ids))
+            for _ in batch
+        )
+    comment_ids = list(Comment.objects.filter(
+        pk__gt=last_comment).order_by('pk').values_list('pk', flat=True))
+    for batch in chunks(comment_ids, batch_size):
+        rebuild_comment_index(batch)
+
+    pairs = {tuple(rng.sample(author_ids, 2))
+             for _ in range(follows if users > 1 else 0)}
+    Follow.objects.bulk_create(
+        (Follow(user_id=user_id, author_id=author_id)
+         for user_id, author_id in pairs),
+        batch_size=batch_size, ignore_conflicts=True,
+    )
+    for user_id, author_id in pairs:
+        timeline.backfill(user_id, author_id)
+
+    for batch in chunks(author_ids, batch_size):
+        rebuild_user_stats(batch)
+    for batch in chunks(post_ids, batch_size):
+        rebuild_comments_counts(batch)
+    return {'users': users, 'groups': groups, 'posts': posts,
+            'comments': comments, 'follows': len(pairs)}
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу; share - доля от 0 до 1."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(share * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+class Target:
+    """Один URL для замера: метод, данные и нужен ли вход."""
+
+    def __init__(self, name, url, method='get', data=None, login=False):
+        self.name = name
+        self.url = url
+        self.method = method
+        self.data = data or {}
+        self.login = login
+
+
+def build_targets():
+    """Цели для всех маршрутов posts.urls на данных из базы."""
+    post = Post.objects.order_by('-comments_count').first()
+    group = Group.objects.order_by('pk').first()
+    reader = User.objects.filter(
+        following__isnull=False).order_by('pk').first()
+    if post is None or group is None or reader is None:
+        raise ValueError('В базе нет данных: сначала выполните seed_data.')
+    author = post.author
+    own_post = reader.posts.first() or post
+    return [
+        Target('index', reverse('posts:index')),
+        Target('index_cursor', reverse('posts:index') + '?after='),
+        Target('group_list', reverse('posts:group_list',
+                                     kwargs={'slug': group.slug})),
+        Target('profile', reverse('posts:profile',
+                                  kwargs={'username': author.username})),
+        Target('post_detail', reverse('posts:post_detail',
+                                      kwargs={'post_id': post.pk})),
+        Target('comments', reverse('posts:comments',
+                                   kwargs={'post_id': post.pk})),
+        Target('search', reverse('posts:search') + '?q='
+               + (post.text.split() or [''])[0]),
+        Target('follow_index', reverse('posts:follow_index'), login=True),
+        Target('create', reverse('posts:create'), login=True),
+        Target('edit', reverse('posts:edit',
+                               kwargs={'post_id': own_post.pk}), login=True),
+        Target('add_comment', reverse('posts:add_comment',
+                                      kwargs={'post_id': post.pk}),
+               method='post', data={'text': 'Комментарий замера'},
+               login=True),
+        Target('profile_follow', reverse(
+            'posts:profile_follow', kwargs={'username': author.username}),
+            login=True),
+        Target('profile_unfollow', reverse(
+            'posts:profile_unfollow', kwargs={'username': author.username}),
+            login=True),
+    ], reader
+
+
+def client_host():
+    """Хост, который пропустит проверка ALLOWED_HOSTS."""
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*':
+            return host.lstrip('.')
+    return 'localhost'
+
+
+# Адрес из TEST-NET: не входит в INTERNAL_IPS, поэтому debug_toolbar
+# не встраивается в ответы и не искажает замер.
+CLIENT_ADDR = '192.0.2.1'
+
+
+class Result:
+    def __init__(self):
+        self.latencies = []
+        self.queries = []
+        self.errors = 0
+
+
+def measure(targets, reader, requests, concurrency=1):
+    """Гоняет каждую цель requests раз в concurrency потоков.
+
+    Возвращает ({имя: Result}, затраченное время). При concurrency=1
+    запросы идут в текущем потоке.
+    """
+    results = defaultdict(Result)
+    lock = threading.Lock()
+
+    def client_loop(share):
+        anonymous = Client(HTTP_HOST=client_host(), REMOTE_ADDR=CLIENT_ADDR)
+        logged_in = Client(HTTP_HOST=client_host(), REMOTE_ADDR=CLIENT_ADDR)
+        logged_in.force_login(reader)
+        for target in targets:
+            client = logged_in if target.login else anonymous
+            for _ in range(share):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = getattr(client, target.method)(
+                        target.url, target.data)
+                    elapsed = time.perf_counter() - started
+                with lock:
+                    result = results[target.name]
+                    result.latencies.append(elapsed)
+                    result.queries.append(len(queries))
+                    result.errors += response.status_code >= 400
+
+    cache.clear()
+    started = time.perf_counter()
+    if concurrency == 1:
+        client_loop(requests)
+    else:
+        shares = [requests // concurrency
+                  + (number < requests % concurrency)
+                  for number in range(concurrency)]
+        threads = [threading.Thread(target=run_and_close,
+                                    args=(client_loop, share))
+                   for share in shares]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return results, time.perf_counter() - started
+
+
+def run_and_close(function, *args):
+    # У каждого потока своё соединение с базой; закрываем его сами.
+    try:
+        function(*args)
+    finally:
+        connections.close_all()
+
+
+def card_posts(count, random_seed=0):
+    """Несохранённые посты с авторами и группами для замера карточек."""
+    rng = random.Random(random_seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(random_seed)
+    authors = [User(pk=number, username=USERNAME.format(number),
+                    first_name=fake.first_name(), last_name=fake.last_name())
+               for number in range(1, 21)]
+    groups = [Group(pk=number, slug=f'bench-{number}', title=str(number))
+              for number in range(1, 6)]
+    posts = []
+    for number in range(1, count + 1):
+        group = rng.choice(groups + [None])
+        posts.append(Post(pk=number, text=fake.text(rng.randint(50, 600)),
+                          pub_date=fake.date_time(tzinfo=timezone.utc),
+                          author=rng.choice(authors), group=group))
+    return posts
+
+
+def measure_cards(sizes=(10, 100, 1000), repeat=5):
+    """Время отрисовки N карточек в мс (медиана из repeat прогонов).
+
+    include - прежний цикл с include author_post.html, cold - post_cards
+    с пустым кэшем, warm - post_cards, когда все карточки уже в кэше.
+    LocMemCache по умолчанию хранит 300 ключей, поэтому warm для 1000
+    карточек честно меряется только на кэше с большим MAX_ENTRIES.
+    """
+    loop = engines['django'].from_string(
+        '{% for post in posts %}{% include "' + CARD_TEMPLATE + '" %}'
+        '{% endfor %}')
+    results = {}
+    for size in sizes:
+        posts = card_posts(size)
+        timings = defaultdict(list)
+        for _ in range(repeat):
+            started = time.perf_counter()
+            loop.render({'posts': posts})
+            timings['include'].append(time.perf_counter() - started)
+            cache.clear()
+            started = time.perf_counter()
+            render_cards(posts)
+            timings['cold'].append(time.perf_counter() - started)
+            started = time.perf_counter()
+            render_cards(posts)
+            timings['warm'].append(time.perf_counter() - started)
+        results[size] = {name: percentile(values, 0.5) * 1000
+                         for name, values in timings.items()}
+    return results
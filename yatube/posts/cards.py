@@ -0,0 +1,72 @@
+"""Отрисовка карточек постов для лент.
+
+Карточка posts/includes/author_post.html в цикле с include каждый раз
+разрешает два {% url %}, зовёт get_full_name, linebreaks и тег thumbnail.
+render_cards берёт готовый HTML карточек из кэша одним get_many, а
+отрисовывает шаблоном только недостающие и кладёт их одним set_many.
+
+Ключ карточки - хэш всего, что попадает в её HTML (текст, картинка,
+имя автора, slug группы, флаги ссылок, язык и префикс URL). Правка поста
+даёт новый ключ, поэтому отдельная инвалидация не нужна: старые версии
+просто истекают через POST_CARD_TIMEOUT.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template import Context
+from django.template.loader import get_template
+from django.urls import get_script_prefix
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+CARD_TEMPLATE = 'posts/includes/author_post.html'
+KEY = 'post_card:{}'
+
+
+def card_key(post, link_profile=True, link_group=True):
+    author = post.author
+    parts = (
+        post.pk, post.pub_date.isoformat(), post.text,
+        post.image.name if post.image else '',
+        post.thumbnails, post.image_variants,
+        author.username, author.get_full_name(),
+        post.group.slug if post.group_id else '',
+        link_profile, link_group,
+        get_language(), timezone.get_current_timezone_name(),
+        get_script_prefix(),
+    )
+    raw = '\x1f'.join(str(part) for part in parts)
+    return KEY.format(hashlib.md5(raw.encode()).hexdigest())
+
+
+def card_renderer(link_profile=True, link_group=True):
+    """Функция отрисовки карточки: шаблон и контекст готовятся один раз."""
+    template = get_template(CARD_TEMPLATE).template
+    context = Context({'link_profile': link_profile,
+                       'link_group': link_group})
+
+    def render(post):
+        with context.push(post=post):
+            return template.render(context)
+    return render
+
+
+def render_cards(posts, link_profile=True, link_group=True):
+    """Список HTML карточек постов: кэш плюс отрисовка недостающих."""
+    posts = list(posts)
+    keys = [card_key(post, link_profile, link_group) for post in posts]
+    cached = cache.get_many(keys)
+    rendered = {}
+    cards = []
+    render = None
+    for post, key in zip(posts, keys):
+        card = cached.get(key) or rendered.get(key)
+        if card is None:
+            render = render or card_renderer(link_profile, link_group)
+            card = rendered[key] = render(post)
+        cards.append(mark_safe(card))
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_TIMEOUT)
+    return cards
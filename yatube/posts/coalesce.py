@@ -0,0 +1,91 @@
+"""Защита дорогих кэшей ленты от лавины пересчётов.
+
+Запись в кэше хранит значение вместе с версией (поколением), временем
+вычисления и мягким сроком жизни. Жёсткий срок длиннее мягкого на
+FEED_CACHE_STALE_TIMEOUT: пока один воркер пересчитывает значение
+под блокировкой, остальные отдают предыдущее.
+"""
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.routers import replica_read
+
+LOCK_KEY = '{}:lock'
+
+
+def should_recompute(delta, expires, now, beta):
+    """Вероятностный ранний пересчёт (XFetch).
+
+    Чем дороже пересчёт (delta) и чем ближе мягкий срок, тем выше шанс,
+    что очередной запрос обновит значение заранее, до истечения срока.
+    """
+    return now - delta * beta * math.log(1 - random.random()) >= expires
+
+
+def store(key, value, version, delta, timeout):
+    cache.set(
+        key,
+        (value, version, delta, time.time() + timeout),
+        timeout + settings.FEED_CACHE_STALE_TIMEOUT,
+    )
+
+
+def compute_and_store(key, compute, version, timeout):
+    started = time.monotonic()
+    value = compute()
+    # Данные с реплики могут быть старше версии: такое значение не храним.
+    if not replica_read():
+        store(key, value, version, time.monotonic() - started, timeout)
+    return value
+
+
+def wait_for(key, version):
+    """Ждёт, пока значение нужной версии посчитает другой воркер."""
+    deadline = time.monotonic() + settings.FEED_CACHE_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(settings.FEED_CACHE_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None and entry[1] == version:
+            return entry
+        if not cache.get(LOCK_KEY.format(key)):
+            # Блокировку отпустили, а значения нет: считаем сами.
+            break
+    return None
+
+
+def get_or_compute(key, compute, timeout, version=None):
+    """Возвращает значение из кэша, пересчитывая его одним воркером.
+
+    * свежее значение отдаётся сразу (с шансом раннего пересчёта);
+    * устаревшее по времени пересчитывает тот, кто взял блокировку,
+      остальные отдают прежнее значение;
+    * при смене версии (запись в данные) старое значение не отдаётся:
+      остальные воркеры ждут результат того, кто взял блокировку.
+    """
+    lock_key = LOCK_KEY.format(key)
+    entry = cache.get(key)
+    if entry is not None and entry[1] == version:
+        value, _, delta, expires = entry
+        if not should_recompute(delta, expires, time.time(),
+                                settings.FEED_CACHE_BETA):
+            return value
+        if not cache.add(lock_key, True, settings.FEED_CACHE_LOCK_TIMEOUT):
+            return value
+        try:
+            return compute_and_store(key, compute, version, timeout)
+        finally:
+            cache.delete(lock_key)
+
+    if cache.add(lock_key, True, settings.FEED_CACHE_LOCK_TIMEOUT):
+        try:
+            return compute_and_store(key, compute, version, timeout)
+        finally:
+            cache.delete(lock_key)
+    entry = wait_for(key, version)
+    if entry is not None:
+        return entry[0]
+    return compute_and_store(key, compute, version, timeout)
@@ -0,0 +1,133 @@
+"""Условные ответы (ETag), Cache-Control и кэш страниц для анонимов.
+
+Версия страницы - поколения областей (posts.generations), из которых
+она собрана, плюс строка запроса. Поколения хранятся в кэше и
+сдвигаются сигналами при каждой записи, поэтому проверка If-None-Match
+не трогает ленту, а для главной не делает ни одного запроса к базе.
+Та же версия входит в ключ кэша готовых страниц: запись сдвигает
+поколение, и затронутые ею страницы сразу перестают находиться в кэше.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.http import quote_etag
+
+from core.routers import replica_read
+
+from .generations import get_generation
+from .models import Group, Post
+
+User = get_user_model()
+
+PAGE_KEY = 'page:{}:{}'
+
+
+def etag_for(request, *scopes, salt=''):
+    """ETag по поколениям scopes - пар (область, pk) - и параметрам GET."""
+    raw = '|'.join([salt, request.GET.urlencode()] + [
+        f'{scope}:{pk}:{get_generation(scope, pk)}' for scope, pk in scopes
+    ])
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def group_pk(slug):
+    return Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+
+
+def author_pk(username):
+    return User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+
+
+def index_etag(request):
+    return etag_for(request, ('global', None), salt='html')
+
+
+def group_etag(request, slug):
+    pk = group_pk(slug)
+    if pk is not None:
+        return etag_for(request, ('group', pk), salt='html')
+    return None
+
+
+def profile_etag(request, username):
+    pk = author_pk(username)
+    if pk is not None:
+        # Счётчики подписок на странице меняет только поколение follows.
+        return etag_for(request, ('author', pk), ('follows', pk),
+                        salt='html')
+    return None
+
+
+def post_etag(request, post_id):
+    author_id = Post.objects.filter(pk=post_id).values_list(
+        'author_id', flat=True).first()
+    if author_id is not None:
+        return etag_for(request, ('post', post_id), ('author', author_id),
+                        salt='html')
+    return None
+
+
+def page_key(request, etag):
+    path = hashlib.md5(request.path.encode()).hexdigest()
+    return PAGE_KEY.format(path, etag)
+
+
+def anonymous_conditional(etag_func):
+    """Условная обработка, публичное кэширование и кэш страниц для анонимов.
+
+    Страница авторизованного пользователя содержит его имя и кнопки,
+    поэтому отдаётся с private, no-cache, без ETag и мимо кэша.
+    Анонимная страница с совпавшим If-None-Match получает 304, иначе
+    берётся из кэша по пути и версии (PAGE_CACHE_TIMEOUT). Страницы,
+    при отрисовке которых понадобился CSRF-токен или которые прочитаны
+    с реплики, не кэшируются и не получают ETag.
+    Vary: Cookie разделяет анонимные и авторизованные ответы.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            etag = None
+            if (request.method in ('GET', 'HEAD')
+                    and not request.user.is_authenticated):
+                etag = etag_func(request, *args, **kwargs)
+            if etag is None:
+                response = view(request, *args, **kwargs)
+                patch_cache_control(response, private=True, no_cache=True)
+                patch_vary_headers(response, ('Cookie',))
+                return response
+
+            response = get_conditional_response(request, quote_etag(etag))
+            if response is not None:
+                patch_cache_control(response, public=True,
+                                    max_age=settings.ANONYMOUS_PAGE_MAX_AGE)
+                patch_vary_headers(response, ('Cookie',))
+                return response
+
+            key = page_key(request, etag)
+            response = cache.get(key)
+            if response is not None:
+                response['X-Page-Cache'] = 'hit'
+                return response
+
+            response = view(request, *args, **kwargs)
+            patch_vary_headers(response, ('Cookie',))
+            if (response.status_code != 200
+                    or request.META.get('CSRF_COOKIE_USED')
+                    or replica_read()):
+                patch_cache_control(response, private=True, no_cache=True)
+                return response
+            response['ETag'] = quote_etag(etag)
+            patch_cache_control(response, public=True,
+                                max_age=settings.ANONYMOUS_PAGE_MAX_AGE)
+            cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+            response['X-Page-Cache'] = 'miss'
+            return response
+        return wrapped
+    return decorator
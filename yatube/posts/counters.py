@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+def shifted(field, delta):
+    # Счётчик мог отстать (bulk_create, ручные правки): не уходим ниже
+    # нуля, иначе удаление строки упадёт на CHECK положительного поля.
+    return Greatest(F(field) + delta, 0) if delta < 0 else F(field) + delta
+
+
+def change_user_stats(user_id, **deltas):
+    """Сдвигает счётчики пользователя на deltas одним UPDATE."""
+    updates = {field: shifted(field, delta)
+               for field, delta in deltas.items()}
+    if UserStats.objects.filter(user_id=user_id).update(**updates):
+        return
+    if min(deltas.values()) < 0:
+        # Уменьшать нечего: строки нет, например пользователь удаляется.
+        return
+    try:
+        with transaction.atomic():
+            UserStats.objects.create(
+                user_id=user_id,
+                **deltas,
+            )
+    except IntegrityError:
+        # Строку успел создать параллельный запрос.
+        UserStats.objects.filter(user_id=user_id).update(**updates)
+
+
+def change_comments_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=shifted('comments_count', delta))
+
+
+def count_subquery(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+def rebuild_user_stats(user_ids):
+    """Пересчитывает счётчики пачки пользователей по живым данным."""
+    users = User.objects.filter(pk__in=user_ids).annotate(
+        posts_total=count_subquery(Post, 'author'),
+        followers_total=count_subquery(Follow, 'author'),
+        following_total=count_subquery(Follow, 'user'),
+    ).values_list('pk', 'posts_total', 'followers_total',
+                  'following_total')
+    stats = [
+        UserStats(user_id=pk, posts_count=posts,
+                  followers_count=followers, following_count=following)
+        for pk, posts, followers, following in users
+    ]
+    with transaction.atomic():
+        UserStats.objects.filter(user_id__in=user_ids).delete()
+        UserStats.objects.bulk_create(stats)
+    return len(stats)
+
+
+def rebuild_comments_counts(post_ids):
+    """Пересчитывает comments_count у пачки постов одним UPDATE."""
+    return Post.objects.filter(pk__in=post_ids).update(
+        comments_count=count_subquery(Comment, 'post'))
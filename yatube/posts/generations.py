@@ -0,0 +1,43 @@
+import time
+
+from django.core.cache import cache
+
+KEY = 'generation:{}'
+
+
+def scope_key(scope, pk=None):
+    return KEY.format(scope if pk is None else f'{scope}:{pk}')
+
+
+def initial_generation():
+    # Старт с текущего времени: если ключ вытеснят из кэша, новое
+    # поколение не совпадёт ни с одним из уже выданных.
+    return int(time.time() * 1000)
+
+
+def get_generation(scope, pk=None):
+    """Текущее поколение области: global, group, author или post."""
+    key = scope_key(scope, pk)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, initial_generation(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(scope, pk=None):
+    """Сдвигает поколение: все фрагменты области становятся устаревшими."""
+    key = scope_key(scope, pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, initial_generation(), timeout=None)
+
+
+def bump_post(post, old_group_id=None):
+    """Сдвигает поколения всех страниц, на которых виден пост."""
+    bump_generation('global')
+    bump_generation('author', post.author_id)
+    bump_generation('post', post.pk)
+    for group_id in {post.group_id, old_group_id} - {None}:
+        bump_generation('group', group_id)
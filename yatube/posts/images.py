@@ -0,0 +1,119 @@
+import json
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .generations import bump_post
+from .models import Post
+
+EXTENSIONS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+    'WEBP': 'webp',
+}
+
+
+def target_format(image):
+    if image.format in settings.POST_IMAGE_FORMATS:
+        return image.format
+    has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+    return 'PNG' if has_alpha else 'JPEG'
+
+
+def normalize_image(post):
+    """Убирает EXIF и переводит картинку поста в веб-формат.
+
+    Поворот из EXIF применяется к пикселям до удаления метаданных.
+    Возвращает True, если файл был перезаписан.
+    """
+    with post.image.open('rb') as file:
+        image = Image.open(file)
+        image.load()
+    fmt = target_format(image)
+    if fmt == image.format and not image.getexif():
+        return False
+    if getattr(image, 'is_animated', False):
+        # Перекодирование анимации потеряет кадры.
+        return False
+    image = ImageOps.exif_transpose(image)
+    if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, fmt, quality=settings.POST_IMAGE_QUALITY)
+
+    old_name = post.image.name
+    base = os.path.splitext(old_name)[0]
+    storage = post.image.storage
+    new_name = storage.save(f'{base}.{EXTENSIONS[fmt]}',
+                            ContentFile(buffer.getvalue()))
+    post.image.name = new_name
+    Post.objects.filter(pk=post.pk).update(image=new_name)
+    if new_name != old_name:
+        storage.delete(old_name)
+    bump_post(post)
+    return True
+
+
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+}
+
+
+def variant_formats():
+    """Форматы из POST_IMAGE_VARIANT_FORMATS, которые умеет этот Pillow."""
+    Image.init()
+    return [fmt for fmt in settings.POST_IMAGE_VARIANT_FORMATS
+            if fmt in Image.SAVE]
+
+
+def delete_variants(post):
+    storage = post.image.storage
+    for variants in json.loads(post.image_variants or '{}').values():
+        for _, name in variants:
+            storage.delete(name)
+
+
+def build_variants(post):
+    """Готовит картинку поста в нескольких ширинах и форматах.
+
+    Кадрирование совпадает с карточкой ленты (POST_IMAGE_VARIANT_ASPECT),
+    ширины берутся из POST_IMAGE_VARIANT_WIDTHS. Результат сохраняется
+    в Post.image_variants для srcset.
+    """
+    delete_variants(post)
+    if not post.image:
+        Post.objects.filter(pk=post.pk).update(image_variants='')
+        return {}
+    with post.image.open('rb') as file:
+        image = Image.open(file)
+        image.load()
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    aspect_width, aspect_height = settings.POST_IMAGE_VARIANT_ASPECT
+    storage = post.image.storage
+    base = os.path.splitext(os.path.basename(post.image.name))[0]
+    variants = {}
+    for fmt in variant_formats():
+        sources = variants.setdefault(MIME_TYPES[fmt], [])
+        for width in settings.POST_IMAGE_VARIANT_WIDTHS:
+            height = round(width * aspect_height / aspect_width)
+            resized = ImageOps.fit(image, (width, height), Image.LANCZOS)
+            buffer = BytesIO()
+            resized.save(buffer, fmt, quality=settings.POST_IMAGE_QUALITY)
+            name = storage.save(
+                f'posts/variants/{post.pk}/{base}-{width}.'
+                f'{fmt.lower()}',
+                ContentFile(buffer.getvalue()),
+            )
+            sources.append([width, name])
+    post.image_variants = json.dumps(variants)
+    Post.objects.filter(pk=post.pk).update(
+        image_variants=post.image_variants)
+    bump_post(post)
+    return variants
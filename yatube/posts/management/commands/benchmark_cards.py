@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from posts.benchmark import measure_cards
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает отрисовку N карточек постов: цикл с include '
+            'против тега post_cards с пустым и заполненным кэшем.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[10, 100, 1000],
+            help='Сколько карточек отрисовать за раз.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько прогонов на каждый размер (берётся медиана).',
+        )
+        parser.add_argument(
+            '--json', metavar='PATH',
+            help='Сохранить результаты в файл для сравнения прогонов.',
+        )
+
+    def handle(self, *args, **options):
+        results = measure_cards(options['sizes'], options['repeat'])
+        self.stdout.write(
+            f'{"cards":>6} {"include ms":>11} {"cold ms":>9} '
+            f'{"warm ms":>9} {"warm x":>7}')
+        for size, row in results.items():
+            self.stdout.write(
+                f'{size:>6} {row["include"]:>11.1f} {row["cold"]:>9.1f} '
+                f'{row["warm"]:>9.1f} '
+                f'{row["include"] / row["warm"]:>7.1f}')
+        if options['json']:
+            with open(options['json'], 'w') as output:
+                json.dump(results, output, indent=2)
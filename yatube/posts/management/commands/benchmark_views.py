@@ -0,0 +1,63 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.benchmark import build_targets, measure, percentile
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку (p50/p95/p99), число запросов к базе и '
+            'пропускную способность всех маршрутов posts.urls.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Сколько раз запросить каждый URL.',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Число одновременных клиентов (потоков).',
+        )
+        parser.add_argument(
+            '--json', metavar='PATH',
+            help='Сохранить результаты в файл для сравнения прогонов.',
+        )
+
+    def handle(self, *args, **options):
+        if settings.DEBUG:
+            self.stderr.write('DEBUG включён: Django запоминает каждый SQL, '
+                              'цифры будут хуже боевых.')
+        try:
+            targets, reader = build_targets()
+        except ValueError as error:
+            raise CommandError(error)
+        results, elapsed = measure(targets, reader, options['requests'],
+                                   options['concurrency'])
+        report = {}
+        self.stdout.write(
+            f'{"view":<18} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+            f'{"queries":>8} {"errors":>7}')
+        for target in targets:
+            result = results[target.name]
+            row = {
+                'p50': percentile(result.latencies, 0.50) * 1000,
+                'p95': percentile(result.latencies, 0.95) * 1000,
+                'p99': percentile(result.latencies, 0.99) * 1000,
+                'queries': sum(result.queries) / len(result.queries),
+                'errors': result.errors,
+            }
+            report[target.name] = row
+            self.stdout.write(
+                f'{target.name:<18} {row["p50"]:>8.1f} {row["p95"]:>8.1f} '
+                f'{row["p99"]:>8.1f} {row["queries"]:>8.1f} '
+                f'{row["errors"]:>7}')
+        total = sum(len(result.latencies) for result in results.values())
+        report['throughput'] = total / elapsed
+        self.stdout.write(
+            f'Всего запросов: {total} за {elapsed:.2f} с '
+            f'({report["throughput"]:.1f} запросов/с, '
+            f'{options["concurrency"]} клиентов)')
+        if options['json']:
+            with open(options['json'], 'w') as output:
+                json.dump(report, output, indent=2)
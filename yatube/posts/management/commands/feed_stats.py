@@ -0,0 +1,26 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cache_backends import is_process_local
+from posts.timeline import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Показывает счётчики раскладки и слияния ленты подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить счётчики после вывода.',
+        )
+
+    def handle(self, *args, **options):
+        if is_process_local(caches['default']):
+            raise CommandError(
+                'Счётчики хранятся в кэше, который виден только процессу '
+                'сайта: команда покажет нули. Задайте общий кэш через '
+                'CACHE_BACKEND (sqlite, redis или memcached).')
+        for name, value in get_stats().items():
+            self.stdout.write(f'{name}: {value}')
+        if options['reset']:
+            reset_stats()
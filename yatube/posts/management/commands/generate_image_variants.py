@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from core.tasks import enqueue
+from posts.images import build_variants
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Генерирует варианты картинок постов для srcset.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перегенерировать и уже обработанные посты.',
+        )
+        parser.add_argument(
+            '--enqueue', action='store_true',
+            help='Не считать здесь, а поставить задачи в очередь worker.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image=None)
+        if not options['all']:
+            posts = posts.filter(image_variants='')
+        done = 0
+        # Поля для bump_post в build_variants, чтобы не догружать их.
+        fields = ('pk', 'image', 'image_variants', 'author_id', 'group_id')
+        for post in posts.only(*fields).iterator():
+            if options['enqueue']:
+                enqueue('posts.generate_variants', post_id=post.pk)
+            else:
+                build_variants(post)
+            done += 1
+        self.stdout.write(f'Обработано постов: {done}')
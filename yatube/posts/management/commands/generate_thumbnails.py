@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Генерирует готовые миниатюры для постов с картинками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перегенерировать и те посты, у которых миниатюры уже есть.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image=None)
+        if not options['all']:
+            posts = posts.filter(thumbnails='')
+        done = 0
+        # author_id и group_id читает bump_post: без них каждый пост
+        # стоил бы двух лишних запросов за отложенными полями.
+        fields = ('pk', 'image', 'author_id', 'group_id')
+        for post in posts.only(*fields).iterator():
+            generate_thumbnails(post)
+            done += 1
+        self.stdout.write(f'Обработано постов: {done}')
@@ -0,0 +1,57 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import get_thumbnail
+
+from posts.models import Post
+
+# Ширина экрана в CSS-пикселях и плотность пикселей типичных клиентов.
+CLIENTS = (
+    ('phone', 375, 2),
+    ('tablet', 768, 2),
+    ('desktop', 1280, 1),
+)
+
+
+def pick_variant(variants, needed_width):
+    """Самый узкий вариант, которого хватает на needed_width."""
+    for width, name in sorted(variants):
+        if width >= needed_width:
+            return name
+    return max(variants)[1]
+
+
+class Command(BaseCommand):
+    help = ('Считает байты картинок на странице ленты: одна JPEG-карточка '
+            '960x339 против выбора браузера по srcset.')
+
+    def handle(self, *args, **options):
+        posts = list(Post.objects.exclude(image='').exclude(
+            image=None)[:settings.NUMBER_POSTS])
+        if not posts:
+            self.stdout.write('Нет постов с картинками.')
+            return
+        geometry, thumbnail_options = settings.POST_THUMBNAILS['card']
+        card_sizes = []
+        for post in posts:
+            thumbnail = get_thumbnail(post.image, geometry,
+                                      **thumbnail_options)
+            card_sizes.append(thumbnail.storage.size(thumbnail.name))
+        before = sum(card_sizes)
+        self.stdout.write(
+            f'Постов с картинками на странице: {len(posts)}')
+        self.stdout.write(f'{"client":<8} {"before":>10} {"after":>10}')
+        for client, css_width, density in CLIENTS:
+            needed = min(css_width, 960) * density
+            after = 0
+            for post, card_size in zip(posts, card_sizes):
+                variants = json.loads(post.image_variants or '{}')
+                if not variants:
+                    # Без вариантов отдаётся та же карточка.
+                    after += card_size
+                    continue
+                # Браузер берёт первый поддерживаемый <source>.
+                name = pick_variant(next(iter(variants.values())), needed)
+                after += post.image.storage.size(name)
+            self.stdout.write(f'{client:<8} {before:>10} {after:>10}')
@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.counters import rebuild_comments_counts, rebuild_user_stats
+from posts.models import Post
+
+User = get_user_model()
+
+
+def chunked_ids(queryset, size):
+    ids = queryset.order_by('pk').values_list('pk', flat=True)
+    chunk = []
+    for pk in ids.iterator():
+        chunk.append(pk)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько строк пересчитывать за один запрос.',
+        )
+
+    def handle(self, *args, **options):
+        size = options['chunk_size']
+        users = sum(rebuild_user_stats(chunk)
+                    for chunk in chunked_ids(User.objects.all(), size))
+        posts = sum(rebuild_comments_counts(chunk)
+                    for chunk in chunked_ids(Post.objects.all(), size))
+        self.stdout.write(
+            f'Пересчитано пользователей: {users}, постов: {posts}')
@@ -0,0 +1,86 @@
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.db import start_pool
+from posts.models import Comment, Post
+from posts.search import rebuild_comment_index, rebuild_post_index
+
+INDEXES = {
+    'posts': (Post, rebuild_post_index),
+    'comments': (Comment, rebuild_comment_index),
+}
+
+
+def id_chunks(queryset, size):
+    """id пачками по size, каждая пачка - отдельный короткий запрос.
+
+    Открытый на всё время курсор мешал бы дочерним процессам
+    фиксировать запись (в SQLite читатель держит блокировку).
+    """
+    ids = queryset.order_by('pk').values_list('pk', flat=True)
+    last = 0
+    while True:
+        chunk = list(ids.filter(pk__gt=last)[:size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+def rebuild_in_child(name, ids):
+    try:
+        return INDEXES[name][1](ids)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс постов и комментариев пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'indexes', nargs='*',
+            help='Какие индексы перестроить: posts, comments; '
+                 'по умолчанию все.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько объектов индексировать за одну пачку.',
+        )
+        parser.add_argument(
+            '--processes', type=int, default=0,
+            help='Размер пула; 0 - индексировать в текущем процессе.',
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options['indexes']) - set(INDEXES)
+        if unknown:
+            raise CommandError(f'Нет такого индекса: {", ".join(unknown)}')
+        processes = options['processes']
+        for name in options['indexes'] or sorted(INDEXES):
+            model, rebuild = INDEXES[name]
+            chunks = id_chunks(model.objects.all(), options['chunk_size'])
+            if processes:
+                done = self.rebuild_parallel(name, chunks, processes)
+            else:
+                done = sum(rebuild(chunk) for chunk in chunks)
+            self.stdout.write(f'Проиндексировано ({name}): {done}')
+
+    def rebuild_parallel(self, name, chunks, processes):
+        """Раздаёт пачки пулу, держа в работе не больше 2 * processes.
+
+        id читаются потоком: в памяти только пачки, ждущие обработки.
+        """
+        done = 0
+        pending = set()
+        with start_pool(processes) as pool:
+            for chunk in chunks:
+                pending.add(pool.submit(rebuild_in_child, name, chunk))
+                if len(pending) >= processes * 2:
+                    finished, pending = wait(pending,
+                                             return_when=FIRST_COMPLETED)
+                    done += sum(future.result() for future in finished)
+            done += sum(future.result() for future in wait(pending)[0])
+        return done
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.benchmark import seed
+
+
+class Command(BaseCommand):
+    help = ('Наполняет базу пользователями, группами, постами, '
+            'комментариями и подписками для замеров.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=1000)
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора: одинаковое зерно - одинаковые данные.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = seed(options['users'], options['groups'],
+                           options['posts'], options['comments'],
+                           options['follows'], options['seed'])
+        self.stdout.write('Создано: ' + ', '.join(
+            f'{name} {count}' for name, count in created.items()))
@@ -0,0 +1,62 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_index(apps, schema_editor):
+    from collections import Counter
+
+    from posts.search import tokenize
+
+    Post = apps.get_model('posts', 'Post')
+    PostToken = apps.get_model('posts', 'PostToken')
+    posts = Post.objects.order_by().values_list(
+        'pk', 'author_id', 'group_id', 'text')
+    PostToken.objects.bulk_create(
+        (PostToken(token=token, post_id=pk, author_id=author_id,
+                   group_id=group_id, frequency=min(count, 32767))
+         for pk, author_id, group_id, text in posts.iterator()
+         for token, count in Counter(tokenize(text)).items()),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0016_comment_cursor_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=32, verbose_name='Слово')),
+                ('frequency', models.PositiveSmallIntegerField(verbose_name='Число вхождений')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор записи')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='posts.Group', verbose_name='Группа записи')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to='posts.Post', verbose_name='Запись')),
+            ],
+            options={
+                'verbose_name': 'Слово индекса',
+                'verbose_name_plural': 'Поисковый индекс',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='posttoken',
+            index=models.Index(fields=['token', 'group'], name='post_token_group_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='posttoken',
+            index=models.Index(fields=['token', 'author'], name='post_token_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='posttoken',
+            constraint=models.UniqueConstraint(fields=('token', 'post'), name='unique_post_token'),
+        ),
+        migrations.RunPython(fill_index, migrations.RunPython.noop),
+    ]
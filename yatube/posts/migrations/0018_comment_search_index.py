@@ -0,0 +1,49 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_index(apps, schema_editor):
+    from collections import Counter
+
+    from posts.search import tokenize
+
+    Comment = apps.get_model('posts', 'Comment')
+    CommentToken = apps.get_model('posts', 'CommentToken')
+    comments = Comment.objects.order_by().values_list('pk', 'text')
+    CommentToken.objects.bulk_create(
+        (CommentToken(token=token, comment_id=pk,
+                      frequency=min(count, 32767))
+         for pk, text in comments.iterator()
+         for token, count in Counter(tokenize(text)).items()),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_post_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=32, verbose_name='Слово')),
+                ('frequency', models.PositiveSmallIntegerField(verbose_name='Число вхождений')),
+                ('comment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to='posts.Comment', verbose_name='Комментарий')),
+            ],
+            options={
+                'verbose_name': 'Слово индекса комментариев',
+                'verbose_name_plural': 'Индекс комментариев',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='commenttoken',
+            constraint=models.UniqueConstraint(fields=('token', 'comment'), name='unique_comment_token'),
+        ),
+        migrations.RunPython(fill_index, migrations.RunPython.noop),
+    ]
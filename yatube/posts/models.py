@@ -1,3 +1,5 @@
+import json
+
 from django.db import models
 from django.contrib.auth import get_user_model
 
@@ -58,15 +60,63 @@ class Post(models.Model):
         blank=True,
         null=True
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев',
+    )
+    thumbnails = models.TextField(
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='Готовые миниатюры',
+        help_text='JSON: имя размера из POST_THUMBNAILS -> URL миниатюры',
+    )
+    image_variants = models.TextField(
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='Варианты картинки для srcset',
+        help_text='JSON: MIME-тип -> список пар [ширина, имя файла]',
+    )
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        indexes = (
+            # Диапазонный скан для курсорной пагинации ленты.
+            models.Index(fields=('-pub_date', '-id'),
+                         name='post_pub_date_id_idx'),
+            # Ленты group_posts и profile: фильтр по ключу плюс сортировка.
+            models.Index(fields=('group', '-pub_date', '-id'),
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='post_author_pub_date_idx'),
+        )
         verbose_name_plural = 'Посты'
         verbose_name = 'Пост'
 
     def __str__(self):
         return self.text[:self.TEXT_LIMIT]
 
+    @property
+    def thumbnail_urls(self):
+        return json.loads(self.thumbnails) if self.thumbnails else {}
+
+    @property
+    def image_sources(self):
+        """Источники для <picture>: MIME-тип и srcset каждого формата."""
+        if not self.image_variants:
+            return []
+        storage = self.image.storage
+        return [
+            {
+                'type': mime,
+                'srcset': ', '.join(f'{storage.url(name)} {width}w'
+                                    for width, name in variants),
+            }
+            for mime, variants in json.loads(self.image_variants).items()
+        ]
+
 
 class Comment(models.Model):
 
@@ -91,7 +141,12 @@ class Comment(models.Model):
     )
 
     class Meta:
-        ordering = ['-created']
+        ordering = ['-created', '-id']
+        indexes = (
+            # Курсорная подгрузка комментариев по (created, id).
+            models.Index(fields=('post', '-created', '-id'),
+                         name='comment_post_created_id_idx'),
+        )
         verbose_name_plural = 'Комментарии'
         verbose_name = 'Комментарий'
 
@@ -112,8 +167,154 @@ class Follow(models.Model):
         verbose_name='Автор записей')
 
     class Meta:
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'author'),
+                                    name='unique_follow'),
+        )
         verbose_name_plural = 'Подписки'
         verbose_name = 'Подписка'
 
     def __str__(self):
         return f'{self.user} подписался на {self.author}'
+
+
+class TimelineEntry(models.Model):
+    """Запись в материализованной ленте подписок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор записи')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Запись')
+    # Копия Post.pub_date: лента сортируется и листается по индексу
+    # этой таблицы, без JOIN с постами для ORDER BY.
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации')
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'post'),
+                                    name='unique_timeline_entry'),
+        )
+        indexes = (
+            models.Index(fields=('user', 'author'),
+                         name='timeline_user_author_idx'),
+            models.Index(fields=('user', '-pub_date', '-post'),
+                         name='timeline_user_pub_date_idx'),
+        )
+        verbose_name_plural = 'Ленты подписок'
+        verbose_name = 'Запись ленты'
+
+    def __str__(self):
+        return f'{self.post_id} в ленте {self.user_id}'
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь')
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число записей')
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписчиков')
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписок')
+
+    class Meta:
+        verbose_name_plural = 'Счётчики пользователей'
+        verbose_name = 'Счётчики пользователя'
+
+    def __str__(self):
+        return f'Счётчики {self.user_id}'
+
+
+class PostToken(models.Model):
+    """Запись инвертированного индекса: слово и пост, где оно встречается.
+
+    Автор и группа поста продублированы, чтобы фильтры поиска
+    не требовали соединения с таблицей постов.
+    """
+
+    token = models.CharField(
+        max_length=32,
+        verbose_name='Слово')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='tokens',
+        verbose_name='Запись')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор записи')
+    group = models.ForeignKey(
+        Group,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name='Группа записи')
+    frequency = models.PositiveSmallIntegerField(
+        verbose_name='Число вхождений')
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(fields=('token', 'post'),
+                                    name='unique_post_token'),
+        )
+        indexes = (
+            models.Index(fields=('token', 'group'),
+                         name='post_token_group_idx'),
+            models.Index(fields=('token', 'author'),
+                         name='post_token_author_idx'),
+        )
+        verbose_name_plural = 'Поисковый индекс'
+        verbose_name = 'Слово индекса'
+
+    def __str__(self):
+        return f'{self.token} -> {self.post_id}'
+
+
+class CommentToken(models.Model):
+    """Запись инвертированного индекса комментариев для поиска в админке."""
+
+    token = models.CharField(
+        max_length=32,
+        verbose_name='Слово')
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        related_name='tokens',
+        verbose_name='Комментарий')
+    frequency = models.PositiveSmallIntegerField(
+        verbose_name='Число вхождений')
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(fields=('token', 'comment'),
+                                    name='unique_comment_token'),
+        )
+        verbose_name_plural = 'Индекс комментариев'
+        verbose_name = 'Слово индекса комментариев'
+
+    def __str__(self):
+        return f'{self.token} -> {self.comment_id}'
@@ -0,0 +1,164 @@
+import base64
+import binascii
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(obj, field='pub_date'):
+    """Кодирует позицию объекта (field, id) в строку для URL."""
+    raw = f'{getattr(obj, field).isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Возвращает пару (дата, id) из строки курсора."""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        moment, pk = raw.rsplit('|', 1)
+        moment = parse_datetime(moment)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+    if moment is None:
+        raise InvalidCursor(cursor)
+    return moment, pk
+
+
+class CountedPaginator(Paginator):
+    """Paginator с заранее известным числом объектов, без COUNT(*)."""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._count = count
+
+    @cached_property
+    def count(self):
+        return self._count
+
+
+class CursorPage:
+    """Страница ленты, выбранная по курсору, без COUNT(*) и OFFSET."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, cursor,
+                 has_next, has_previous, direction='after'):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor = cursor
+        self.direction = direction
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<CursorPage {self.cursor or "first"}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def number(self):
+        # Используется как ключ кэша фрагментов вместо номера страницы.
+        # Направление входит в ключ: страницы after=X и before=X разные.
+        if not self.cursor:
+            return 'first'
+        return f'{self.direction[0]}:{self.cursor}'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next:
+            return encode_cursor(self.object_list[-1],
+                                 self.paginator.field)
+        return None
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        if not self.object_list:
+            # После последней записи пусто: назад - всё, что новее курсора.
+            return self.cursor
+        return encode_cursor(self.object_list[0], self.paginator.field)
+
+
+class CursorPaginator:
+    """Keyset-пагинация по (field, id) в порядке убывания.
+
+    Каждая страница - один запрос с диапазонным условием по индексу
+    и LIMIT per_page + 1: лишняя запись показывает, есть ли продолжение.
+    По умолчанию ключ - pub_date постов, для комментариев - created.
+    """
+
+    def __init__(self, object_list, per_page, field='pub_date'):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.field = field
+        self.ordering = (f'-{field}', '-id')
+
+    # Условие field >= moment (<=) дублирует OR ниже, но даёт SQLite
+    # начать чтение индекса с курсора, а не с начала ленты.
+    def newer(self, moment, pk):
+        return Q(**{f'{self.field}__gte': moment}) & (
+            Q(**{f'{self.field}__gt': moment})
+            | Q(**{self.field: moment, 'id__gt': pk}))
+
+    def older(self, moment, pk):
+        return Q(**{f'{self.field}__lte': moment}) & (
+            Q(**{f'{self.field}__lt': moment})
+            | Q(**{self.field: moment, 'id__lt': pk}))
+
+    def page(self, after=None, before=None):
+        """Возвращает страницу после курсора after или перед before."""
+        if before:
+            moment, pk = decode_cursor(before)
+            posts = list(
+                self.object_list.filter(
+                    self.newer(moment, pk)
+                ).order_by(self.field, 'id')[:self.per_page + 1]
+            )
+            if not posts:
+                return self.page()
+            has_previous = len(posts) > self.per_page
+            posts = posts[:self.per_page][::-1]
+            return CursorPage(posts, self, before,
+                              has_next=True, has_previous=has_previous,
+                              direction='before')
+
+        posts = self.object_list.order_by(*self.ordering)
+        if after:
+            moment, pk = decode_cursor(after)
+            posts = posts.filter(self.older(moment, pk))
+        posts = list(posts[:self.per_page + 1])
+        has_next = len(posts) > self.per_page
+        return CursorPage(posts[:self.per_page], self, after,
+                          has_next=has_next, has_previous=bool(after))
+
+    def get_page(self, after=None, before=None):
+        """Как page(), но при битом курсоре отдаёт первую страницу."""
+        try:
+            return self.page(after, before)
+        except InvalidCursor:
+            return self.page()
@@ -0,0 +1,265 @@
+"""Полнотекстовый поиск по постам на собственном инвертированном индексе.
+
+Индекс (PostToken, CommentToken) обновляется сигналами при сохранении
+и удаляется каскадно вместе с записью. Ранжирование - сумма tf * idf
+по словам запроса; все слова запроса обязательны. Совпадения ищутся
+среди SEARCH_CANDIDATE_LIMIT самых новых постов с самым редким словом
+запроса: более старые совпадения частых запросов в выдачу не попадают.
+"""
+import base64
+import binascii
+import math
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (Case, Count, F, IntegerField, Q, Sum, Value,
+                              When)
+
+from .models import Comment, CommentToken, Post, PostToken
+from .paginators import CursorPage, CursorPaginator, InvalidCursor
+
+TOKEN_RE = re.compile(r'\w+')
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 32
+MAX_QUERY_TOKENS = 8
+# idf умножается на SCORE_SCALE и округляется: оценка - целое число,
+# и курсор сравнивает её точно, без равенства float.
+SCORE_SCALE = 1000
+# Частоты слов и число постов для idf не обязаны быть точными.
+STATS_TIMEOUT = 300
+
+
+def tokenize(text):
+    """Слова текста в нижнем регистре, ё приравнена к е."""
+    words = TOKEN_RE.findall(text.lower().replace('ё', 'е'))
+    return [word[:MAX_TOKEN_LENGTH] for word in words
+            if len(word) >= MIN_TOKEN_LENGTH]
+
+
+def sync_tokens(postings, text, make_token):
+    """Приводит записи индекса одного объекта к словам text.
+
+    Удаляются только исчезнувшие слова, добавляются новые,
+    у остальных при необходимости меняется число вхождений.
+    """
+    wanted = {token: min(count, 32767)
+              for token, count in Counter(tokenize(text)).items()}
+    existing = dict(postings.values_list('token', 'frequency'))
+    stale = [token for token in existing if token not in wanted]
+    if stale:
+        postings.filter(token__in=stale).delete()
+    changed = {}
+    for token, frequency in wanted.items():
+        if token in existing and existing[token] != frequency:
+            changed.setdefault(frequency, []).append(token)
+    for frequency, tokens in changed.items():
+        postings.filter(token__in=tokens).update(frequency=frequency)
+    postings.model.objects.bulk_create(
+        make_token(token, frequency) for token, frequency in wanted.items()
+        if token not in existing
+    )
+
+
+def index_post(post, old_text=None):
+    """Обновляет записи индекса поста.
+
+    old_text - текст до сохранения: если он не менялся (например,
+    в админке сменили только группу), слова не пересчитываются.
+    """
+    postings = PostToken.objects.filter(post_id=post.pk)
+    postings.exclude(
+        author_id=post.author_id, group_id=post.group_id,
+    ).update(author_id=post.author_id, group_id=post.group_id)
+    if old_text is not None and old_text == post.text:
+        return
+    sync_tokens(postings, post.text, lambda token, frequency: PostToken(
+        token=token, post_id=post.pk, author_id=post.author_id,
+        group_id=post.group_id, frequency=frequency))
+
+
+def index_comment(comment, old_text=None):
+    """Обновляет записи индекса комментария."""
+    if old_text is not None and old_text == comment.text:
+        return
+    sync_tokens(CommentToken.objects.filter(comment_id=comment.pk),
+                comment.text,
+                lambda token, frequency: CommentToken(
+                    token=token, comment_id=comment.pk,
+                    frequency=frequency))
+
+
+def rebuild_post_index(ids):
+    """Заново строит индекс для пачки постов; возвращает число постов.
+
+    Удаление и вставка - одна транзакция: поиск не видит пачку без слов.
+    """
+    posts = Post.objects.filter(pk__in=ids).order_by().values_list(
+        'pk', 'author_id', 'group_id', 'text')
+    with transaction.atomic():
+        PostToken.objects.filter(post_id__in=ids).delete()
+        PostToken.objects.bulk_create(
+            PostToken(token=token, post_id=pk, author_id=author_id,
+                      group_id=group_id, frequency=min(count, 32767))
+            for pk, author_id, group_id, text in posts
+            for token, count in Counter(tokenize(text)).items()
+        )
+    return len(ids)
+
+
+def rebuild_comment_index(ids):
+    """Заново строит индекс для пачки комментариев."""
+    comments = Comment.objects.filter(pk__in=ids).order_by().values_list(
+        'pk', 'text')
+    with transaction.atomic():
+        CommentToken.objects.filter(comment_id__in=ids).delete()
+        CommentToken.objects.bulk_create(
+            CommentToken(token=token, comment_id=pk,
+                         frequency=min(count, 32767))
+            for pk, text in comments
+            for token, count in Counter(tokenize(text)).items()
+        )
+    return len(ids)
+
+
+def matching(postings, owner, tokens):
+    """id объектов (поле owner), в которых есть все слова tokens."""
+    return postings.filter(token__in=tokens).values(owner).annotate(
+        matched=Count('id'),
+    ).filter(matched=len(tokens)).order_by().values(owner)
+
+
+def total_posts():
+    return cache.get_or_set('search:total_posts', Post.objects.count,
+                            STATS_TIMEOUT)
+
+
+def document_frequencies(tokens):
+    key = 'search:df:{}'
+    cached = cache.get_many([key.format(token) for token in tokens])
+    frequencies = {token: cached[key.format(token)]
+                   for token in tokens if key.format(token) in cached}
+    missing = [token for token in tokens if token not in frequencies]
+    if missing:
+        counted = dict(PostToken.objects.filter(
+            token__in=missing
+        ).values_list('token').annotate(Count('id')).order_by())
+        for token in missing:
+            frequencies[token] = counted.get(token, 0)
+        cache.set_many({key.format(token): frequencies[token]
+                        for token in missing}, STATS_TIMEOUT)
+    return frequencies
+
+
+def encode_rank_cursor(score, pk):
+    raw = f'{score}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_rank_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        score, pk = base64.urlsafe_b64decode(
+            padded.encode()).decode().rsplit('|', 1)
+        return int(score), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+
+
+class RankedPage(CursorPage):
+    """Страница результатов по релевантности; листается только вперёд."""
+
+    def __init__(self, object_list, paginator, cursor, next_cursor):
+        super().__init__(object_list, paginator, cursor,
+                         has_next=next_cursor is not None,
+                         has_previous=bool(cursor))
+        self._next_cursor = next_cursor
+
+    @property
+    def next_cursor(self):
+        return self._next_cursor
+
+    @property
+    def previous_cursor(self):
+        return None
+
+
+class PostSearch:
+    """Поисковый запрос с фильтрами по группе и автору."""
+
+    def __init__(self, query, group=None, author=None):
+        self.tokens = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TOKENS]
+        self.group = group
+        self.author = author
+
+    def filtered(self, postings):
+        if self.group is not None:
+            postings = postings.filter(group=self.group)
+        if self.author is not None:
+            postings = postings.filter(author=self.author)
+        return postings
+
+    def candidates(self, frequencies):
+        """Самые новые посты с самым редким словом запроса."""
+        rarest = min(self.tokens, key=frequencies.get)
+        return self.filtered(
+            PostToken.objects.filter(token=rarest)
+        ).order_by('-post_id').values(
+            'post_id')[:settings.SEARCH_CANDIDATE_LIMIT]
+
+    def postings(self, frequencies):
+        postings = PostToken.objects.filter(
+            token__in=self.tokens,
+            post__in=self.candidates(frequencies),
+        )
+        return self.filtered(postings).values('post').annotate(
+            matched=Count('id'),
+        ).filter(matched=len(self.tokens)).order_by()
+
+    def ranked(self):
+        total = total_posts()
+        frequencies = document_frequencies(self.tokens)
+        weights = [
+            When(token=token, then=F('frequency') * Value(round(
+                SCORE_SCALE * math.log(1 + total / (1 + frequencies[token]))
+            )))
+            for token in self.tokens
+        ]
+        return self.postings(frequencies).annotate(
+            score=Sum(Case(*weights, output_field=IntegerField())),
+        ).order_by('-score', '-post_id')
+
+    def page(self, per_page, after=None):
+        """Страница постов по убыванию релевантности."""
+        if not self.tokens:
+            return RankedPage([], self, after, None)
+        ranked = self.ranked()
+        if after:
+            try:
+                score, pk = decode_rank_cursor(after)
+            except InvalidCursor:
+                after = None
+            else:
+                ranked = ranked.filter(
+                    Q(score__lt=score) | Q(score=score, post__lt=pk))
+        rows = list(ranked.values_list('post', 'score')[:per_page + 1])
+        next_cursor = None
+        if len(rows) > per_page:
+            rows = rows[:per_page]
+            next_cursor = encode_rank_cursor(rows[-1][1], rows[-1][0])
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for pk, _ in rows])
+        return RankedPage([posts[pk] for pk, _ in rows if pk in posts],
+                          self, after, next_cursor)
+
+    def by_date(self, per_page, after=None, before=None):
+        """Страница найденных постов от новых к старым."""
+        if not self.tokens:
+            posts = Post.objects.none()
+        else:
+            posts = Post.objects.filter(pk__in=self.postings(
+                document_frequencies(self.tokens)).values('post'))
+        posts = posts.select_related('author', 'group')
+        return CursorPaginator(posts, per_page).get_page(after, before)
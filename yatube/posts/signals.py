@@ -0,0 +1,198 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core.tasks import enqueue
+
+from . import counters, search, timeline
+from .generations import bump_generation, bump_post
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+# Поля пользователя, которые выводятся на страницах.
+NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        timeline.push_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    # Сразу - только первая страница ленты, остальное в воркере:
+    # подписка на автора с тысячами постов не держит запрос.
+    if created and timeline.backfill(instance.user_id, instance.author_id,
+                                     limit=settings.NUMBER_POSTS):
+        enqueue('posts.backfill', user_id=instance.user_id,
+                author_id=instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_stats(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.change_user_stats(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.change_comments_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_stats(instance.author_id, followers_count=1)
+        counters.change_user_stats(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.change_user_stats(instance.author_id, followers_count=-1)
+    counters.change_user_stats(instance.user_id, following_count=-1)
+
+
+@receiver(post_delete, sender=Follow)
+def refan_unpopular_author(sender, instance, **kwargs):
+    # Подключён после uncount_follow: счётчик уже уменьшен.
+    followers = UserStats.objects.filter(
+        user_id=instance.author_id
+    ).values_list('followers_count', flat=True).first()
+    if followers == settings.FANOUT_FOLLOWER_THRESHOLD:
+        # Автор только что опустился до порога и больше не подмешивается.
+        enqueue('posts.unpopular', author_id=instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_state(sender, instance, **kwargs):
+    # При смене группы устаревает и страница прежней группы,
+    # а по старому тексту поисковый индекс решает, что пересчитывать.
+    instance._old_group_id = instance._old_text = None
+    if instance.pk is not None:
+        instance._old_group_id, instance._old_text = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', 'text').first() or (None, None)
+
+
+@receiver(pre_save, sender=Comment)
+def remember_old_comment_text(sender, instance, **kwargs):
+    instance._old_text = None
+    if instance.pk is not None:
+        instance._old_text = Comment.objects.filter(
+            pk=instance.pk
+        ).values_list('text', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def invalidate_post_fragments(sender, instance, **kwargs):
+    bump_post(instance, getattr(instance, '_old_group_id', None))
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post_fragments(sender, instance, **kwargs):
+    bump_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_fragments(sender, instance, **kwargs):
+    bump_generation('post', instance.post_id)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.index_post(instance, getattr(instance, '_old_text', None))
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, **kwargs):
+    search.index_comment(instance, getattr(instance, '_old_text', None))
+
+
+def bump_group_pages(group):
+    """Сдвигает поколения всех страниц, где видны ссылка и описание группы."""
+    bump_generation('global')
+    bump_generation('group', group.pk)
+    authors = group.posts.order_by().values_list(
+        'author_id', flat=True).distinct()
+    for author_id in authors:
+        bump_generation('author', author_id)
+    for post_id in group.posts.values_list('pk', flat=True):
+        bump_generation('post', post_id)
+
+
+def bump_author_pages(author_id):
+    """Сдвигает поколения всех страниц, где видно имя пользователя."""
+    bump_generation('global')
+    bump_generation('author', author_id)
+    posts = Post.objects.filter(author_id=author_id)
+    groups = posts.exclude(group=None).order_by().values_list(
+        'group_id', flat=True).distinct()
+    for group_id in groups:
+        bump_generation('group', group_id)
+    # Имя видно и под комментариями к чужим постам.
+    post_ids = set(posts.values_list('pk', flat=True)) | set(
+        Comment.objects.filter(author_id=author_id).values_list(
+            'post_id', flat=True))
+    for post_id in post_ids:
+        bump_generation('post', post_id)
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_pages(sender, instance, created, **kwargs):
+    if not created:
+        bump_group_pages(instance)
+
+
+@receiver(pre_delete, sender=Group)
+def invalidate_deleted_group_pages(sender, instance, **kwargs):
+    # Посты остаются без группы одним UPDATE, без сигналов постов,
+    # поэтому страницы со ссылкой на группу сдвигаем до удаления.
+    bump_group_pages(instance)
+
+
+@receiver(pre_save, sender=User)
+def remember_old_name(sender, instance, update_fields=None, **kwargs):
+    # Вход сохраняет только last_login: такие сохранения не проверяем.
+    instance._old_name = None
+    if instance.pk is not None and (
+            update_fields is None
+            or set(update_fields).intersection(NAME_FIELDS)):
+        instance._old_name = User.objects.filter(
+            pk=instance.pk).values_list(*NAME_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_pages(sender, instance, created, **kwargs):
+    old_name = getattr(instance, '_old_name', None)
+    if not created and old_name is not None and old_name != tuple(
+            getattr(instance, field) for field in NAME_FIELDS):
+        bump_author_pages(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_counts(sender, instance, **kwargs):
+    # Счётчики подписчиков и подписок видны на страницах обоих профилей.
+    bump_generation('follows', instance.author_id)
+    bump_generation('follows', instance.user_id)
@@ -0,0 +1,41 @@
+from core.tasks import enqueue, task
+
+from . import timeline
+from .images import build_variants, normalize_image
+from .models import Post
+from .thumbnails import generate_thumbnails
+
+
+@task('posts.process_image')
+def process_image(post_id):
+    """Очищает картинку поста и ставит в очередь миниатюры и варианты."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    normalize_image(post)
+    enqueue('posts.generate_thumbnails', post_id=post_id)
+    enqueue('posts.generate_variants', post_id=post_id)
+
+
+@task('posts.generate_thumbnails')
+def thumbnails(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        generate_thumbnails(post)
+
+
+@task('posts.generate_variants')
+def variants(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        build_variants(post)
+
+
+@task('posts.backfill')
+def backfill(user_id, author_id):
+    timeline.backfill_rest(user_id, author_id)
+
+
+@task('posts.unpopular')
+def unpopular(author_id):
+    timeline.unpopular(author_id)
@@ -0,0 +1,69 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+from django.template import TemplateSyntaxError, VariableDoesNotExist
+
+from posts.coalesce import get_or_compute
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist, timeout_var, fragment_name,
+                 vary_on, versions):
+        self.nodelist = nodelist
+        self.timeout_var = timeout_var
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+        self.versions = versions
+
+    def render(self, context):
+        try:
+            timeout = int(self.timeout_var.resolve(context))
+        except (VariableDoesNotExist, ValueError, TypeError):
+            raise TemplateSyntaxError(
+                f'"feed_cache" tag got a bad timeout: '
+                f'{self.timeout_var.var!r}')
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        version = tuple(var.resolve(context) for var in self.versions)
+        return get_or_compute(
+            make_template_fragment_key(f'feed.{self.fragment_name}',
+                                       vary_on),
+            lambda: self.nodelist.render(context),
+            timeout,
+            version,
+        )
+
+
+@register.tag('feed_cache')
+def do_feed_cache(parser, token):
+    """Как {% cache %}, но с защитой от лавины пересчётов.
+
+    Использование::
+
+        {% feed_cache [timeout] [fragment_name] [var1] .. versions [v1] .. %}
+            ...
+        {% endfeed_cache %}
+
+    Переменные после versions задают версию фрагмента (поколения из
+    posts.generations); ключ от них не зависит, поэтому при истечении
+    срока остальные воркеры отдают прежнее значение, а при смене версии
+    ждут единственный пересчёт.
+    """
+    nodelist = parser.parse(('endfeed_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires at least 2 arguments.')
+    versions = []
+    if 'versions' in tokens[3:]:
+        position = tokens.index('versions', 3)
+        versions = tokens[position + 1:]
+        tokens = tokens[:position]
+    return FeedCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(t) for t in tokens[3:]],
+        [parser.compile_filter(t) for t in versions],
+    )
@@ -0,0 +1,10 @@
+from django import template
+
+from posts.generations import get_generation
+
+register = template.Library()
+
+
+@register.simple_tag
+def generation(scope, pk=None):
+    return get_generation(scope, pk)
@@ -0,0 +1,17 @@
+from django import template
+
+from posts.cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts, link_profile=True, link_group=True):
+    """Карточки постов ленты вместо include author_post.html в цикле.
+
+    Использование::
+
+        {% post_cards page_obj link_group=False as cards %}
+        {% for card in cards %}{{ card }}{% endfor %}
+    """
+    return render_cards(posts, link_profile, link_group)
@@ -0,0 +1,104 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, CommentToken, Group, Post, PostToken
+
+User = get_user_model()
+
+
+class AdminSearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='moderator', email='mod@example.com', password='pass')
+        cls.user = User.objects.create(username='Tolstoy')
+        cls.group = Group.objects.create(title='Проза', slug='prose',
+                                         description='Проза')
+        cls.war = Post.objects.create(author=cls.user, text='Война и мир')
+        cls.peace = Post.objects.create(author=cls.admin,
+                                        text='Мировой порядок')
+        cls.comment = Comment.objects.create(
+            post=cls.war, author=cls.admin, text='Длинный роман')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist(self, model, **params):
+        response = self.client.get(
+            reverse(f'admin:posts_{model}_changelist'), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_search_uses_token_index(self):
+        """Поиск ищет целые слова по индексу и автора по имени."""
+        result = self.changelist('post', q='мир').context['cl'].result_list
+        self.assertEqual(list(result), [self.war])
+        result = self.changelist(
+            'post', q='Tolstoy').context['cl'].result_list
+        self.assertEqual(list(result), [self.war])
+        result = self.changelist(
+            'comment', q='РОМАН').context['cl'].result_list
+        self.assertEqual(list(result), [self.comment])
+
+    def test_list_editable_updates_index_in_place(self):
+        """Смена группы в списке не пересобирает слова поста."""
+        before = set(PostToken.objects.filter(
+            post=self.war).values_list('pk', flat=True))
+        response = self.client.post(
+            reverse('admin:posts_post_changelist'), {
+                'form-TOTAL_FORMS': 1,
+                'form-INITIAL_FORMS': 1,
+                'form-0-id': self.war.pk,
+                'form-0-group': self.group.pk,
+                '_save': 'Сохранить',
+            })
+        self.assertEqual(response.status_code, 302)
+        tokens = PostToken.objects.filter(post=self.war)
+        self.assertEqual(set(tokens.values_list('pk', flat=True)), before)
+        self.assertEqual(set(tokens.values_list('group', flat=True)),
+                         {self.group.pk})
+
+    def test_comment_edit_reindexes(self):
+        self.comment.text = 'Короткий роман'
+        self.comment.save()
+        self.assertEqual(
+            set(self.comment.tokens.values_list('token', flat=True)),
+            {'короткий', 'роман'})
+
+    @override_settings(ADMIN_FACET_LIMIT=1)
+    def test_facets_are_bounded(self):
+        """Фасеты показывают не больше ADMIN_FACET_LIMIT вариантов."""
+        Group.objects.create(title='Поэзия', slug='poetry',
+                             description='Поэзия')
+        response = self.changelist('post')
+        facets = {spec.title: spec
+                  for spec in response.context['cl'].filter_specs}
+        self.assertEqual(len(facets['группа'].lookup_choices), 1)
+        self.changelist('comment', author=self.admin.pk)
+
+    def test_rebuild_command(self):
+        """Команда восстанавливает индекс целиком."""
+        PostToken.objects.all().delete()
+        CommentToken.objects.all().delete()
+        call_command('rebuild_search_index', chunk_size=1, stdout=StringIO())
+        self.assertEqual(
+            set(self.war.tokens.values_list('token', flat=True)),
+            {'война', 'мир'})
+        self.assertTrue(self.comment.tokens.exists())
+
+    def test_rebuild_keeps_index_on_failure(self):
+        """Упавшая пачка не оставляет посты без слов в индексе."""
+        with mock.patch.object(PostToken.objects, 'bulk_create',
+                               side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                call_command('rebuild_search_index', 'posts',
+                             stdout=StringIO())
+        self.assertEqual(
+            set(self.war.tokens.values_list('token', flat=True)),
+            {'война', 'мир'})
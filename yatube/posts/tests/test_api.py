@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+@override_settings(NUMBER_POSTS=2)
+class FeedApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Chekhov')
+        cls.group = Group.objects.create(title='Рассказы', slug='stories',
+                                         description='Рассказы')
+        cls.posts = [
+            Post.objects.create(author=cls.user, group=cls.group,
+                                text=f'Рассказ {i}')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_serialize_posts(self):
+        """Все три ленты отдают компактный JSON с курсором."""
+        for url in (
+            reverse('api_v1:index'),
+            reverse('api_v1:group_list', kwargs={'slug': 'stories'}),
+            reverse('api_v1:profile', kwargs={'username': 'Chekhov'}),
+        ):
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual([post['id'] for post in data['results']],
+                                 [self.posts[2].id, self.posts[1].id])
+                self.assertEqual(data['results'][0]['group'], 'stories')
+                self.assertEqual(data['results'][0]['author'], 'Chekhov')
+                rest = self.client.get(url, {'after': data['next']}).json()
+                self.assertEqual([post['id'] for post in rest['results']],
+                                 [self.posts[0].id])
+
+    def test_not_modified_skips_feed_query(self):
+        """Совпавший ETag даёт 304 без запроса к ленте."""
+        url = reverse('api_v1:index')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        other_page = self.client.get(url, {'after': 'x'})['ETag']
+        self.assertNotEqual(other_page, etag)
+
+        self.posts[0].text = 'Правка'
+        self.posts[0].save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_unknown_group_is_404(self):
+        response = self.client.get(
+            reverse('api_v1:group_list', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, 404)
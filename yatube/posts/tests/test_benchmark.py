@@ -0,0 +1,58 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..benchmark import percentile, seed
+from ..models import Comment, Follow, Post, TimelineEntry, UserStats
+
+
+class BenchmarkTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.created = seed(users=5, groups=2, posts=30, comments=40,
+                           follows=6, batch_size=7)
+
+    def test_seed_builds_derived_data(self):
+        """Набор данных согласован: счётчики, индекс и ленты построены."""
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertEqual(Follow.objects.count(), self.created['follows'])
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)),
+            30)
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertFalse(Post.objects.filter(tokens__isnull=True).exists())
+
+    def test_benchmark_reports_every_view(self):
+        tmp_dir = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, tmp_dir, ignore_errors=True)
+        path = os.path.join(tmp_dir, 'report.json')
+        call_command('benchmark_views', requests=2, concurrency=1,
+                     json=path, stdout=StringIO(), stderr=StringIO())
+        with open(path) as report_file:
+            report = json.load(report_file)
+        for name in ('index', 'group_list', 'profile', 'post_detail',
+                     'comments', 'search', 'follow_index', 'create',
+                     'edit', 'add_comment', 'profile_follow',
+                     'profile_unfollow'):
+            with self.subTest(name=name):
+                self.assertEqual(report[name]['errors'], 0)
+        self.assertGreater(report['throughput'], 0)
+
+    def test_card_benchmark_reports_sizes(self):
+        out = StringIO()
+        call_command('benchmark_cards', sizes=[1, 3], repeat=1, stdout=out)
+        rows = out.getvalue().splitlines()[1:]
+        self.assertEqual([row.split()[0] for row in rows], ['1', '3'])
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([], 0.5), 0.0)
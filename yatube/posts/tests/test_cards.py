@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.template import engines
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..cards import CARD_TEMPLATE, card_key, render_cards
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class PostCardsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            'author', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        for number in range(3):
+            Post.objects.create(text=f'Текст\n\nпоста {number}',
+                                author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.posts = list(Post.objects.select_related('author', 'group'))
+
+    def test_same_html_as_include_loop(self):
+        """Тег отдаёт тот же HTML, что и цикл с include карточки."""
+        loop = engines['django'].from_string(
+            '{% for post in posts %}{% include "' + CARD_TEMPLATE + '" '
+            'with link_group=False %}{% endfor %}')
+        expected = loop.render({'posts': self.posts})
+        for _ in range(2):
+            cards = render_cards(self.posts, link_group=False)
+            self.assertEqual(''.join(cards), expected)
+
+    def test_cached_cards_not_rendered_again(self):
+        render_cards(self.posts)
+        post = self.posts[0]
+        cache.set(card_key(post), 'из кэша')
+        self.assertEqual(render_cards(self.posts)[0], 'из кэша')
+
+    def test_key_follows_card_content(self):
+        post = self.posts[0]
+        key = card_key(post)
+        self.assertNotEqual(card_key(post, link_profile=False), key)
+        post.text = 'Исправленный текст'
+        self.assertNotEqual(card_key(post), key)
+        post.refresh_from_db()
+        post.author.first_name = 'Алексей'
+        self.assertNotEqual(card_key(post), key)
+
+    def test_edit_shows_new_text(self):
+        render_cards(self.posts)
+        Post.objects.filter(pk=self.posts[0].pk).update(text='Новый текст')
+        posts = list(Post.objects.select_related('author', 'group'))
+        with CaptureQueriesContext(connection) as queries:
+            cards = render_cards(posts)
+        self.assertIn('Новый текст', cards[0])
+        self.assertEqual(len(queries), 0)
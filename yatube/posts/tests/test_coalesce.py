@@ -0,0 +1,70 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from ..coalesce import LOCK_KEY, get_or_compute, store
+
+
+@override_settings(FEED_CACHE_WAIT=0.2, FEED_CACHE_POLL_INTERVAL=0.01)
+class GetOrComputeTest(SimpleTestCase):
+    key = 'feed:test'
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return f'render {self.calls}'
+
+    def test_fresh_value_served_without_recompute(self):
+        """Свежее значение отдаётся без пересчёта."""
+        self.assertEqual(get_or_compute(self.key, self.compute, 60, 1),
+                         'render 1')
+        with mock.patch('posts.coalesce.random.random', return_value=0):
+            self.assertEqual(get_or_compute(self.key, self.compute, 60, 1),
+                             'render 1')
+        self.assertEqual(self.calls, 1)
+
+    def test_expired_value_served_while_other_worker_rebuilds(self):
+        """Пока пересчёт занят другим воркером, отдаётся прежнее значение."""
+        store(self.key, 'old', 1, 0.5, timeout=-1)
+        cache.add(LOCK_KEY.format(self.key), True)
+        self.assertEqual(get_or_compute(self.key, self.compute, 60, 1),
+                         'old')
+        self.assertEqual(self.calls, 0)
+
+    def test_expired_value_rebuilt_by_lock_holder(self):
+        """Устаревшее значение пересчитывает тот, кто взял блокировку."""
+        store(self.key, 'old', 1, 0.5, timeout=-1)
+        self.assertEqual(get_or_compute(self.key, self.compute, 60, 1),
+                         'render 1')
+        self.assertIsNone(cache.get(LOCK_KEY.format(self.key)))
+
+    def test_early_recompute_near_expiry(self):
+        """XFetch: дорогое значение у края срока пересчитывается заранее."""
+        store(self.key, 'old', 1, delta=10, timeout=1)
+        with mock.patch('posts.coalesce.random.random', return_value=0.99):
+            self.assertEqual(get_or_compute(self.key, self.compute, 60, 1),
+                             'render 1')
+
+    def test_new_version_waits_for_single_rebuild(self):
+        """После смены версии старое значение не отдаётся."""
+        store(self.key, 'old', 1, 0.5, timeout=60)
+        cache.add(LOCK_KEY.format(self.key), True)
+
+        def other_worker_finishes(seconds):
+            store(self.key, 'new', 2, 0.5, timeout=60)
+
+        with mock.patch('posts.coalesce.time.sleep',
+                        side_effect=other_worker_finishes):
+            self.assertEqual(get_or_compute(self.key, self.compute, 60, 2),
+                             'new')
+        self.assertEqual(self.calls, 0)
+
+    def test_wait_gives_up_and_computes(self):
+        """Если пересчёт другого воркера не дождаться, считаем сами."""
+        cache.add(LOCK_KEY.format(self.key), True)
+        self.assertEqual(get_or_compute(self.key, self.compute, 60, 1),
+                         'render 1')
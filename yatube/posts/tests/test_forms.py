@@ -1,10 +1,19 @@
+import json
+import re
 import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from PIL import Image
 
 from ..models import Group, Post
 
@@ -108,3 +117,122 @@ class PostFormTests(TestCase):
 
         self.assertEqual(Post.objects.count(), posts_count)
         self.assertFalse(Post.objects.filter(text=form_data['text']).exists())
+
+    def test_thumbnails_generated_on_upload(self):
+        """Миниатюры готовятся фоновой задачей, а не в шаблоне."""
+        uploaded = SimpleUploadedFile(
+            name='thumb.gif',
+            content=(
+                b'\x47\x49\x46\x38\x39\x61\x02\x00'
+                b'\x01\x00\x80\x00\x00\x00\x00\x00'
+                b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+                b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+                b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+                b'\x0A\x00\x3B'
+            ),
+            content_type='image/gif'
+        )
+        self.authorized_user.post(
+            reverse('posts:create'),
+            data={'text': 'Пост с картинкой', 'image': uploaded},
+        )
+        call_command('worker', once=True, processes=0, stdout=StringIO())
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertEqual(set(post.thumbnail_urls),
+                         set(settings.POST_THUMBNAILS))
+        with mock.patch(
+            'sorl.thumbnail.templatetags.thumbnail.get_thumbnail'
+        ) as engine:
+            response = self.authorized_user.get(
+                reverse('posts:post_detail', kwargs={'post_id': post.id}))
+        engine.assert_not_called()
+        self.assertContains(response, post.thumbnail_urls['card'])
+
+    def upload(self, name, fmt, **save_options):
+        buffer = BytesIO()
+        Image.new('RGB', (4, 2), 'red').save(buffer, fmt, **save_options)
+        self.authorized_user.post(
+            reverse('posts:create'),
+            data={'text': name, 'image': SimpleUploadedFile(
+                name=name, content=buffer.getvalue())},
+        )
+        call_command('worker', once=True, processes=0, stdout=StringIO())
+        post = Post.objects.get(text=name)
+        with post.image.open('rb') as file:
+            image = Image.open(file)
+            image.load()
+        return post, image
+
+    def test_image_converted_to_web_format(self):
+        """BMP перекодируется фоновой задачей в JPEG."""
+        post, image = self.upload('picture.bmp', 'BMP')
+        self.assertEqual(image.format, 'JPEG')
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        self.assertIn('card', post.thumbnail_urls)
+
+    def test_exif_stripped(self):
+        """EXIF удаляется из загруженного JPEG."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Камера'
+        post, image = self.upload('photo.jpg', 'JPEG', exif=exif)
+        self.assertEqual(len(image.getexif()), 0)
+
+    def test_image_variants_in_srcset(self):
+        """Варианты картинки попадают в srcset карточки ленты."""
+        post, _ = self.upload('wide.png', 'PNG')
+        sources = post.image_sources
+        self.assertTrue(sources)
+        widths = settings.POST_IMAGE_VARIANT_WIDTHS
+        self.assertEqual(sources[0]['srcset'].count('w,'), len(widths) - 1)
+        cache.clear()
+        response = self.authorized_user.get(reverse('posts:index'))
+        self.assertContains(response, sources[0]['srcset'])
+        output = StringIO()
+        call_command('image_bytes_benchmark', stdout=output)
+        self.assertIn('phone', output.getvalue())
+
+    def test_backfill_commands_load_fields_for_bump(self):
+        """Команды дозаполнения не догружают отложенные поля поста."""
+        self.upload('backfill.png', 'PNG')
+        for command in ('generate_thumbnails', 'generate_image_variants'):
+            with self.subTest(command=command):
+                with CaptureQueriesContext(connection) as queries:
+                    call_command(command, all=True, stdout=StringIO())
+                deferred = [query['sql'] for query in queries
+                            if re.fullmatch(
+                                r'SELECT "posts_post"\."id", '
+                                r'"posts_post"\."\w+" FROM "posts_post" '
+                                r'WHERE "posts_post"\."id" = \d+',
+                                query['sql'])]
+                self.assertEqual(deferred, [])
+
+    def test_replaced_image_variants_deleted(self):
+        """Замена картинки удаляет файлы прежних вариантов."""
+        post, _ = self.upload('old.png', 'PNG')
+        storage = post.image.storage
+        old_files = [name for _, name in
+                     next(iter(json.loads(post.image_variants).values()))]
+        self.assertTrue(all(storage.exists(name) for name in old_files))
+        self.authorized_user.post(
+            reverse('posts:edit', kwargs={'post_id': post.pk}),
+            {'text': post.text, 'image-clear': 'on'},
+        )
+        call_command('worker', once=True, processes=0, stdout=StringIO())
+        self.assertFalse(any(storage.exists(name) for name in old_files))
+
+    def test_variants_deleted_after_fields_cleared(self):
+        """Файлы удаляются, когда пост в базе уже на них не ссылается."""
+        post, _ = self.upload('old.png', 'PNG')
+        stored = []
+
+        def remember_fields(instance):
+            stored.append(Post.objects.values_list(
+                'thumbnails', 'image_variants').get(pk=instance.pk))
+
+        with mock.patch('posts.views.delete_variants',
+                        side_effect=remember_fields):
+            self.authorized_user.post(
+                reverse('posts:edit', kwargs={'post_id': post.pk}),
+                {'text': post.text, 'image-clear': 'on'},
+            )
+        self.assertEqual(stored, [('', '')])
@@ -1,7 +1,19 @@
+from io import StringIO
+from itertools import product
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, UserStats
+from ..paginators import encode_cursor
 
-from ..models import Group, Post
+FANOUT_FOLLOWER_THRESHOLD = settings.FANOUT_FOLLOWER_THRESHOLD
 
 User = get_user_model()
 
@@ -32,3 +44,141 @@ class PostModelTest(TestCase):
         for model, str_value in PostModelTest.test_for_model:
             with self.subTest(model=model):
                 self.assertEqual(str(model), str_value)
+
+
+class QueryPlanTest(TestCase):
+    """Запросы вьюх читают таблицы постов через индексы."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Euclid')
+        cls.reader = User.objects.create_user(username='Archimedes')
+        cls.group = Group.objects.create(
+            title='Геометрия', slug='geometry', description='Начала')
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Аксиомы')
+        Comment.objects.create(post=cls.post, author=cls.reader, text='Да')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def plan_steps(self, url, params=None):
+        """Шаги планов всех SELECT, выполненных при запросе url."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, params)
+        for query in queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            for step in self.explain(query['sql']):
+                yield query['sql'], step
+
+    def test_view_queries_use_indexes(self):
+        """Ни одна вьюха не сканирует таблицы posts_* без индекса."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            for sql, step in self.plan_steps(url):
+                with self.subTest(url=url, step=step):
+                    self.assertFalse(
+                        step.startswith('SCAN posts_')
+                        and 'INDEX' not in step,
+                        sql,
+                    )
+
+    def test_feeds_read_in_index_order(self):
+        """Ленты не сортируют выборку во временном B-дереве."""
+        feeds = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:follow_index'),
+        )
+        cursor = encode_cursor(self.post)
+        pages = ({}, {'after': cursor}, {'before': cursor})
+        for threshold in (FANOUT_FOLLOWER_THRESHOLD, 0):
+            # С порогом 0 автор популярен и читается отдельным потоком.
+            with override_settings(FANOUT_FOLLOWER_THRESHOLD=threshold):
+                for url, params in product(feeds, pages):
+                    for sql, step in self.plan_steps(url, params):
+                        with self.subTest(url=url, params=params,
+                                          threshold=threshold, step=step):
+                            self.assertNotIn('USE TEMP B-TREE', step, sql)
+
+    def test_follow_is_unique(self):
+        """Повторная подписка не создаёт дубликат."""
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.user)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Pythagoras')
+        cls.reader = User.objects.create_user(username='Philolaus')
+
+    def test_counters_follow_create_and_delete(self):
+        """Счётчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(author=self.author, text='Числа')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Всё есть число')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.author.stats.posts_count, 1)
+        self.assertEqual(self.author.stats.followers_count, 1)
+        self.assertEqual(self.reader.stats.following_count, 1)
+
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(stats.followers_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 0)
+
+    def test_delete_with_lagging_counters(self):
+        """Удаление не падает, если счётчик отстал от живых строк."""
+        post = Post.objects.create(author=self.author, text='Числа')
+        Comment.objects.bulk_create([
+            Comment(post=post, author=self.reader, text='Мимо сигналов')])
+        Follow.objects.bulk_create([
+            Follow(user=self.reader, author=self.author)])
+        Comment.objects.get(post=post).delete()
+        Follow.objects.get(user=self.reader).delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 0)
+
+    def test_rebuild_counters_fixes_drift(self):
+        """rebuild_counters возвращает счётчики к живым значениям."""
+        post = Post.objects.create(author=self.author, text='Числа')
+        Comment.objects.create(post=post, author=self.reader, text='Да')
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.update(
+            posts_count=7, followers_count=7, following_count=7)
+        Post.objects.update(comments_count=7)
+        call_command('rebuild_counters', chunk_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        author_stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(author_stats.following_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1)
@@ -0,0 +1,140 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.testing import QueryBudgetMixin
+
+from ..benchmark import Target, build_targets, seed
+from ..models import Comment, Post
+
+User = get_user_model()
+
+# Бюджеты запросов на страницу при холодном кэше. Главное свойство -
+# число запросов не зависит от размера страницы; если тест упал после
+# изменения шаблона или view, ищите запрос в цикле (N+1).
+ANONYMOUS_BUDGETS = {
+    'index': 2,
+    'index_cursor': 1,
+    'group_list': 4,
+    'profile': 3,
+    'post_detail': 3,
+    'comments': 2,
+    'search': 4,
+}
+# Плюс сессия и пользователь.
+LOGGED_IN_BUDGETS = {
+    'index': 4,
+    'group_list': 5,
+    'profile': 6,
+    'post_detail': 5,
+    'search': 6,
+    'follow_index': 5,
+    'create': 3,
+    'edit': 4,
+    'add_comment': 7,
+    # Плюс задача дозаполнения ленты, если у автора больше страницы постов.
+    'profile_follow': 12,
+    'profile_unfollow': 9,
+}
+API_BUDGETS = {
+    'api_v1:index': 1,
+    'api_v1:group_list': 3,
+    'api_v1:profile': 3,
+}
+PAGE_SIZES = (5, 20)
+# Маршруты, которые меняют данные: повтор идёт по другой ветке
+# (подписка уже есть), поэтому их замеряем один раз.
+WRITES = {'add_comment', 'profile_follow', 'profile_unfollow'}
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    """Число запросов каждого маршрута posts.urls на полных страницах."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(users=4, groups=2, posts=120, comments=60, follows=8)
+        cls.targets, cls.reader = build_targets()
+        post = Post.objects.order_by('-comments_count').first()
+        Comment.objects.bulk_create(
+            Comment(post=post, author=author, text='Комментарий')
+            for author in User.objects.all() for _ in range(8)
+        )
+
+    def measure(self, target, budget, size):
+        cache.clear()
+        with override_settings(NUMBER_POSTS=size, NUMBER_COMMENTS=size):
+            with self.assertQueryBudget(budget) as queries:
+                response = getattr(self.client, target.method)(
+                    target.url, target.data)
+        self.assertLess(response.status_code, 400)
+        return len(queries)
+
+    def check_budgets(self, budgets, login):
+        if login:
+            self.client.force_login(self.reader)
+        for target in self.targets:
+            if target.name not in budgets:
+                continue
+            sizes = PAGE_SIZES[-1:] if target.name in WRITES else PAGE_SIZES
+            with self.subTest(target=target.name, login=login):
+                counts = {self.measure(target, budgets[target.name], size)
+                          for size in sizes}
+                self.assertEqual(len(counts), 1,
+                                 f'число запросов зависит от размера '
+                                 f'страницы: {counts}')
+
+    def test_anonymous_budgets(self):
+        self.check_budgets(ANONYMOUS_BUDGETS, login=False)
+
+    def test_logged_in_budgets(self):
+        self.check_budgets(LOGGED_IN_BUDGETS, login=True)
+
+    @override_settings(TIMELINE_BATCH_SIZE=PAGE_SIZES[0])
+    def test_follow_budget_independent_of_author_posts(self):
+        """Подписка и отписка не растут с числом постов автора.
+
+        Сразу раскладывается только первая страница, остальное уходит
+        задачей в очередь; у обоих авторов постов больше страницы, а
+        пачка вставки не больше страницы, так что полная раскладка
+        дала бы лишние INSERT.
+        """
+        self.client.force_login(self.reader)
+        counts = {'profile_follow': set(), 'profile_unfollow': set()}
+        for number, posts in enumerate((PAGE_SIZES[0] + 1,
+                                        PAGE_SIZES[0] * 6)):
+            author = User.objects.create(username=f'Prolific{number}')
+            for _ in range(posts):
+                Post.objects.create(author=author, text='Пост')
+            for name in counts:
+                url = reverse(f'posts:{name}',
+                              kwargs={'username': author.username})
+                counts[name].add(self.measure(
+                    Target(name, url), LOGGED_IN_BUDGETS[name],
+                    PAGE_SIZES[0]))
+        for name, sizes in counts.items():
+            with self.subTest(target=name):
+                self.assertEqual(len(sizes), 1,
+                                 f'число запросов зависит от числа '
+                                 f'постов автора: {sizes}')
+
+    def test_every_route_has_budget(self):
+        names = {target.name for target in self.targets}
+        self.assertEqual(names - set(ANONYMOUS_BUDGETS)
+                         - set(LOGGED_IN_BUDGETS), set())
+
+    def test_api_budgets(self):
+        post = Post.objects.filter(group__isnull=False).first()
+        kwargs = {
+            'api_v1:index': {},
+            'api_v1:group_list': {'slug': post.group.slug},
+            'api_v1:profile': {'username': post.author.username},
+        }
+        for name, budget in API_BUDGETS.items():
+            with self.subTest(name=name):
+                for size in PAGE_SIZES:
+                    cache.clear()
+                    with override_settings(NUMBER_POSTS=size):
+                        with self.assertQueryBudget(budget):
+                            self.client.get(reverse(name,
+                                                    kwargs=kwargs[name]))
@@ -1,14 +1,22 @@
+import os
 import tempfile
+from io import StringIO
 
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.core.management import CommandError, call_command
 from django.urls import reverse
 from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Group, Post, Follow
+from ..models import Comment, Group, Post, Follow, TimelineEntry
 from ..forms import PostForm
+from ..generations import bump_generation
+from ..search import decode_rank_cursor
+from ..timeline import get_stats, reset_stats
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -144,14 +152,66 @@ class PostPagesTests(TestCase):
             author=self.user)
         content_add = self.authorized_client.get(
             reverse('posts:index')).content
+        # update() идёт мимо сигналов: фрагмент остаётся в кэше.
+        Post.objects.filter(pk=post.pk).update(text='Изменено в обход')
+        content_cached = self.authorized_client.get(
+            reverse('posts:index')).content
+        self.assertEqual(content_add, content_cached)
         post.delete()
         content_delete = self.authorized_client.get(
             reverse('posts:index')).content
-        self.assertEqual(content_add, content_delete)
-        cache.clear()
-        content_cache_clear = self.authorized_client.get(
-            reverse('posts:index')).content
-        self.assertNotEqual(content_add, content_cache_clear)
+        self.assertNotEqual(content_add, content_delete)
+
+    def test_fragments_invalidated_on_write(self):
+        """Запись сдвигает поколение, и фрагменты не отдаются устаревшими."""
+        urls_texts = (
+            (reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+             'Текст группы'),
+            (reverse('posts:profile', kwargs={'username': self.user}),
+             'Текст профиля'),
+            (reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+             'Текст поста'),
+        )
+        for url, text in urls_texts:
+            with self.subTest(url=url):
+                self.authorized_client.get(url)
+                self.authorized_client.post(
+                    reverse('posts:edit', kwargs={'post_id': self.post.id}),
+                    {'text': text, 'group': self.group.id},
+                )
+                self.assertContains(self.authorized_client.get(url), text)
+
+    def test_post_detail_shows_new_comment(self):
+        """Новый комментарий сразу виден на закэшированной странице."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.authorized_client.get(url)
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': 'Свежий комментарий'},
+        )
+        self.assertContains(self.authorized_client.get(url),
+                            'Свежий комментарий')
+
+    def test_group_change_invalidates_old_group(self):
+        """Пост, перенесённый в другую группу, пропадает из старой."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.assertContains(self.authorized_client.get(url), self.post.text)
+        self.authorized_client.post(
+            reverse('posts:edit', kwargs={'post_id': self.post.id}),
+            {'text': self.post.text, 'group': self.group_no_post.id},
+        )
+        self.assertNotContains(self.authorized_client.get(url),
+                               self.post.text)
+
+    def test_post_aside_follows_group_generation(self):
+        """Описание группы в карточке поста зависит от поколения группы."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.authorized_client.get(url)
+        Group.objects.filter(pk=self.group.pk).update(
+            description='Новое описание')
+        bump_generation('group', self.group.pk)
+        self.assertContains(self.authorized_client.get(url),
+                            'Новое описание')
 
 
 class FollowTest(TestCase):
@@ -212,3 +272,449 @@ class FollowTest(TestCase):
         response = self.author_client.get(
             reverse('posts:follow_index'))
         self.assertNotIn(post, response.context['page_obj'].object_list)
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Heraclitus')
+        cls.posts = [
+            Post.objects.create(text=f'Пост {i}', author=cls.user)
+            for i in range(settings.NUMBER_POSTS + 3)
+        ]
+        # Одинаковая дата у всех постов: порядок держится на id.
+        Post.objects.update(pub_date=cls.posts[0].pub_date)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_pages_cover_feed_without_gaps(self):
+        """Курсорные страницы идут подряд по (pub_date, id)."""
+        first = self.client.get(
+            reverse('posts:index'), {'after': ''})
+        page_obj = self.client.get(
+            reverse('posts:index'),
+            {'after': first.context['page_obj'].next_cursor},
+        ).context['page_obj']
+        self.assertFalse(page_obj.has_next())
+        self.assertTrue(page_obj.has_previous())
+        ids = [post.id for post in page_obj]
+        expected = sorted((post.id for post in self.posts), reverse=True)
+        self.assertEqual(ids, expected[settings.NUMBER_POSTS:])
+
+        previous = self.client.get(
+            reverse('posts:index'),
+            {'before': page_obj.previous_cursor},
+        ).context['page_obj']
+        self.assertEqual(
+            [post.id for post in previous],
+            expected[:settings.NUMBER_POSTS],
+        )
+        self.assertFalse(previous.has_previous())
+
+    def test_directions_do_not_share_fragment(self):
+        """Страница before=X не попадает в кэш фрагмента страницы after=X."""
+        cursor = self.client.get(
+            reverse('posts:index'), {'after': ''}
+        ).context['page_obj'].next_cursor
+        self.client.get(reverse('posts:index'), {'before': cursor})
+        response = self.client.get(reverse('posts:index'), {'after': cursor})
+        self.assertContains(response, 'Пост 0')
+        self.assertNotContains(response, f'Пост {len(self.posts) - 1}')
+
+    @override_settings(CURSOR_PAGINATION_VIEWS=('profile',))
+    def test_view_opts_into_cursor_mode(self):
+        """Вью из CURSOR_PAGINATION_VIEWS отдаёт курсорную страницу."""
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': self.user}))
+        page_obj = response.context['page_obj']
+        self.assertTrue(page_obj.is_cursor)
+        self.assertEqual(len(page_obj), settings.NUMBER_POSTS)
+        self.assertContains(response, f'?after={page_obj.next_cursor}')
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Битый курсор не роняет страницу."""
+        response = self.client.get(
+            reverse('posts:index'), {'after': 'not-a-cursor'})
+        self.assertEqual(len(response.context['page_obj']),
+                         settings.NUMBER_POSTS)
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Seneca')
+        cls.reader = User.objects.create(username='Lucilius')
+        cls.old_post = Post.objects.create(
+            text='Запись до подписки', author=cls.author)
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get_feed(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'].object_list)
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка дозаполняет ленту, отписка очищает её."""
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}))
+        self.assertEqual(self.get_feed(), [self.old_post])
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}))
+        self.assertEqual(self.get_feed(), [])
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_follow_backfills_first_page_and_queues_rest(self):
+        """Сразу в ленту идёт одна страница, остальное - через воркер."""
+        Post.objects.bulk_create(
+            Post(text=f'Письмо {i}', author=self.author)
+            for i in range(settings.NUMBER_POSTS + 2))
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}))
+        entries = TimelineEntry.objects.filter(user=self.reader)
+        self.assertEqual(entries.count(), settings.NUMBER_POSTS)
+        call_command('worker', once=True, processes=0, stdout=StringIO())
+        self.assertEqual(entries.count(), settings.NUMBER_POSTS + 3)
+        self.assertEqual(
+            set(entries.values_list('post_id', 'pub_date')),
+            set(Post.objects.values_list('pk', 'pub_date')))
+
+    def test_new_post_pushed_to_followers(self):
+        """Новая запись автора попадает в ленту подписчика."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        author_client = Client()
+        author_client.force_login(self.author)
+        author_client.post(reverse('posts:create'), {'text': 'Новая'})
+        new_post = Post.objects.get(text='Новая')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=new_post).exists())
+        self.assertEqual(self.get_feed(), [new_post, self.old_post])
+
+    @override_settings(FANOUT_FOLLOWER_THRESHOLD=1)
+    def test_popular_author_merged_on_read(self):
+        """Записи популярного автора подмешиваются при чтении ленты."""
+        pushed_author = User.objects.create(username='Epictetus')
+        Follow.objects.create(user=self.reader, author=pushed_author)
+        pushed = Post.objects.create(text='Через ленту',
+                                     author=pushed_author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=pushed_author, author=self.author)
+        reset_stats()
+        pulled = Post.objects.create(text='Популярная', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(post=pulled).exists())
+        self.assertEqual(self.get_feed(), [pulled, pushed, self.old_post])
+        stats = get_stats()
+        self.assertEqual(stats['push_skipped'], 1)
+        self.assertEqual(stats['read_streams'], 2)
+
+    def test_feed_stats_needs_shared_cache(self):
+        """Команда не печатает нули из кэша чужого процесса."""
+        with self.assertRaises(CommandError):
+            call_command('feed_stats', stdout=StringIO())
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+                'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+            }}):
+                Post.objects.create(text='Посчитанная', author=self.author)
+                out = StringIO()
+                call_command('feed_stats', stdout=out)
+        self.assertIn('push_posts: 1', out.getvalue())
+
+    @override_settings(FANOUT_FOLLOWER_THRESHOLD=1)
+    def test_posts_kept_when_author_stops_being_popular(self):
+        """Записи времён популярности остаются в ленте после отписок."""
+        other = User.objects.create(username='Zeno')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        popular = Post.objects.create(text='Пока популярен',
+                                      author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(post=popular).exists())
+        Follow.objects.filter(user=other).delete()
+        # Раскладка по лентам идёт в воркере, а не в запросе отписки.
+        self.assertFalse(TimelineEntry.objects.filter(post=popular).exists())
+        call_command('worker', once=True, processes=0, stdout=StringIO())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=popular).exists())
+        self.assertEqual(self.get_feed(), [popular, self.old_post])
+
+
+@override_settings(NUMBER_COMMENTS=3)
+class CommentPageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Diogenes')
+        cls.post = Post.objects.create(text='Ищу человека', author=cls.user)
+        cls.comments = [
+            Comment.objects.create(post=cls.post, author=cls.user,
+                                   text=f'Комментарий {i}')
+            for i in range(7)
+        ]
+        Comment.objects.update(created=cls.comments[0].created)
+        cls.expected = sorted((c.id for c in cls.comments), reverse=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_renders_fixed_page(self):
+        """post_detail отдаёт только первую страницу комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        page = response.context['comments']
+        self.assertEqual([c.id for c in page], self.expected[:3])
+        self.assertContains(response, 'js-more-comments')
+
+    def test_cached_fragment_skips_comment_query(self):
+        """При готовом фрагменте комментариев их запрос не выполняется."""
+        self.client.force_login(self.user)
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertContains(response, 'Комментарий 6')
+        self.assertFalse([query for query in queries
+                          if 'FROM "posts_comment"' in query['sql']])
+
+    def test_fragment_endpoint_pages_through_comments(self):
+        """Фрагменты и JSON подгружают остальные комментарии по курсору."""
+        url = reverse('posts:comments', kwargs={'post_id': self.post.id})
+        seen = []
+        after = ''
+        while after is not None:
+            data = self.client.get(
+                url, {'after': after, 'format': 'json'}).json()
+            seen += [comment['id'] for comment in data['comments']]
+            after = data['next']
+        self.assertEqual(seen, self.expected)
+
+        response = self.client.get(url, {'after': after or ''})
+        self.assertTemplateUsed(response, 'posts/includes/comment_list.html')
+        self.assertEqual(len(response.context['comments']), 3)
+
+
+@override_settings(NUMBER_POSTS=2)
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Lermontov')
+        cls.other = User.objects.create(username='Pushkin')
+        cls.group = Group.objects.create(title='Стихи', slug='poems',
+                                         description='Стихи')
+        cls.sail = Post.objects.create(
+            author=cls.user, group=cls.group,
+            text='Белеет парус одинокий, парус в тумане')
+        cls.storm = Post.objects.create(
+            author=cls.user, text='Парус и буря')
+        cls.sea = Post.objects.create(
+            author=cls.other, group=cls.group, text='Ветер по морю гуляет')
+        cls.url = reverse('posts:search')
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, **params):
+        response = self.client.get(self.url, params)
+        return [post.id for post in response.context['page_obj']]
+
+    def test_tokens_indexed_and_updated(self):
+        """Индекс строится при сохранении и обновляется при правке."""
+        self.assertEqual(self.search(q='ПАРУС'),
+                         [self.sail.id, self.storm.id])
+        self.storm.text = 'Только буря'
+        self.storm.save()
+        self.assertEqual(self.search(q='парус'), [self.sail.id])
+        self.assertEqual(self.search(q='буря'), [self.storm.id])
+
+    def test_all_words_required(self):
+        """Пост находится, только если в нём есть все слова запроса."""
+        self.assertEqual(self.search(q='парус буря'), [self.storm.id])
+        self.assertEqual(self.search(q='парус море'), [])
+        self.assertEqual(self.search(q=''), [])
+
+    def test_filters(self):
+        """Фильтры по группе и автору сужают выдачу."""
+        self.assertEqual(self.search(q='парус', group='poems'),
+                         [self.sail.id])
+        self.assertEqual(self.search(q='ветер', author='Lermontov'), [])
+        self.assertEqual(self.search(q='ветер', author='Pushkin'),
+                         [self.sea.id])
+
+    def test_cursor_pages(self):
+        """Курсор по релевантности и по дате проходит всю выдачу."""
+        posts = [Post.objects.create(author=self.other, text=f'парус {i}')
+                 for i in range(3)]
+        for sort in ('rank', 'date'):
+            seen = []
+            params = {'q': 'парус', 'sort': sort}
+            while True:
+                response = self.client.get(self.url, params)
+                page = response.context['page_obj']
+                seen += [post.id for post in page]
+                if not page.has_next():
+                    break
+                self.assertContains(response, 'sort=' + sort)
+                params['after'] = page.next_cursor
+            self.assertEqual(
+                sorted(seen),
+                sorted([self.sail.id, self.storm.id]
+                       + [post.id for post in posts]))
+        self.assertEqual(self.search(q='парус', sort='date')[0],
+                         posts[-1].id)
+
+    def test_rank_cursor_holds_integer_score(self):
+        """Курсор по релевантности сравнивает целые оценки, а не float."""
+        for i in range(settings.NUMBER_POSTS):
+            Post.objects.create(author=self.other, text=f'парус {i}')
+        page = self.client.get(
+            self.url, {'q': 'парус'}).context['page_obj']
+        score, pk = decode_rank_cursor(page.next_cursor)
+        self.assertIsInstance(score, int)
+        self.assertEqual(pk, page[len(page) - 1].id)
+
+    @override_settings(SEARCH_CANDIDATE_LIMIT=2)
+    def test_candidates_bounded_by_rarest_word(self):
+        """Совпадения ищутся среди новейших постов с самым редким словом."""
+        for text in ('Парус', 'Парус'):
+            Post.objects.create(author=self.other, text=text)
+        self.assertEqual(self.search(q='парус буря'), [self.storm.id])
+        newer = [Post.objects.create(author=self.other, text='Буря')
+                 for _ in range(2)]
+        cache.clear()
+        # "буря" теперь реже "парус", и два новых поста вытесняют storm.
+        self.assertEqual(self.search(q='парус буря'), [])
+        self.assertEqual(self.search(q='буря', sort='date'),
+                         [post.id for post in reversed(newer)])
+
+
+class ConditionalResponseTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Gogol')
+        cls.reader = User.objects.create(username='Reader')
+        cls.group = Group.objects.create(title='Повести', slug='tales',
+                                         description='Повести')
+        cls.post = Post.objects.create(author=cls.user, group=cls.group,
+                                       text='Шинель')
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'tales'}),
+            reverse('posts:profile', kwargs={'username': 'Gogol'}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.id}),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_pages_are_public_and_conditional(self):
+        """Анонимные страницы кэшируемы и отвечают 304 по ETag."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_writes_change_etag(self):
+        """Правка поста, группы и подписки меняют ETag своих страниц."""
+        def etag(url):
+            return self.client.get(url)['ETag']
+
+        index, group, profile, detail = (etag(url) for url in self.urls)
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Хорошо')
+        self.assertNotEqual(etag(self.urls[3]), detail)
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.assertNotEqual(etag(self.urls[2]), profile)
+        self.assertEqual(etag(self.urls[0]), index)
+        self.post.text = 'Нос'
+        self.post.save()
+        self.assertNotEqual(etag(self.urls[0]), index)
+
+    def test_group_and_name_edits_change_every_page(self):
+        """Группа и имя автора видны на всех четырёх страницах."""
+        def etags():
+            return [self.client.get(url)['ETag'] for url in self.urls]
+
+        edits = (
+            (self.group, 'description', 'Петербургские повести'),
+            (self.user, 'first_name', 'Николай'),
+        )
+        for instance, field, value in edits:
+            with self.subTest(field=field):
+                before = etags()
+                setattr(instance, field, value)
+                instance.save()
+                for url, old, new in zip(self.urls, before, etags()):
+                    self.assertNotEqual(old, new, url)
+
+    def test_login_keeps_etags(self):
+        before = [self.client.get(url)['ETag'] for url in self.urls]
+        self.client.force_login(self.user)
+        self.client.logout()
+        self.assertEqual(
+            [self.client.get(url)['ETag'] for url in self.urls], before)
+
+    def test_authenticated_pages_are_private(self):
+        self.client.force_login(self.reader)
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('private', response['Cache-Control'])
+                self.assertFalse(response.has_header('ETag'))
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Turgenev')
+        cls.post = Post.objects.create(author=cls.user, text='Муму')
+        cls.other = Post.objects.create(author=cls.user, text='Ася')
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+
+    def status(self, url, client=None):
+        return (client or self.client).get(url).get('X-Page-Cache')
+
+    def test_hit_after_miss_and_purge_on_write(self):
+        """Страница берётся из кэша, пока её не затронет запись."""
+        index = reverse('posts:index')
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        other = reverse('posts:post_detail',
+                        kwargs={'post_id': self.other.id})
+        for url in (index, detail, other):
+            self.assertEqual(self.status(url), 'miss')
+            self.assertEqual(self.status(url), 'hit')
+
+        self.author_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': 'Жалко'})
+        self.assertEqual(self.status(detail), 'miss')
+        self.assertEqual(self.status(other), 'hit')
+        self.assertEqual(self.status(index), 'hit')
+
+        self.author_client.post(reverse('posts:create'), {'text': 'Отцы'})
+        self.assertEqual(self.status(index), 'miss')
+        self.assertContains(self.client.get(index), 'Отцы')
+
+    def test_query_string_is_part_of_key(self):
+        index = reverse('posts:index')
+        self.assertEqual(self.status(index), 'miss')
+        self.assertEqual(self.status(index + '?page=1'), 'miss')
+
+    def test_authenticated_requests_bypass_cache(self):
+        index = reverse('posts:index')
+        self.assertEqual(self.status(index), 'miss')
+        self.assertIsNone(self.status(index, self.author_client))
@@ -0,0 +1,29 @@
+import json
+
+from django.conf import settings
+from sorl.thumbnail import get_thumbnail
+
+from .generations import bump_post
+from .models import Post
+
+
+def build_thumbnails(image):
+    """Генерирует все размеры из POST_THUMBNAILS, возвращает их URL."""
+    if not image:
+        return {}
+    return {
+        name: get_thumbnail(image, geometry, **options).url
+        for name, (geometry, options) in settings.POST_THUMBNAILS.items()
+    }
+
+
+def generate_thumbnails(post):
+    """Сохраняет у поста готовые миниатюры для шаблонов.
+
+    Поле обновляется через update(), чтобы не запускать сигналы
+    сохранения поста второй раз; закэшированные фрагменты со ссылкой
+    на исходную картинку устаревают через bump_post.
+    """
+    post.thumbnails = json.dumps(build_thumbnails(post.image))
+    Post.objects.filter(pk=post.pk).update(thumbnails=post.thumbnails)
+    bump_post(post)
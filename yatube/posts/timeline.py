@@ -0,0 +1,262 @@
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+STATS_KEY = 'feed_stats:{}'
+STATS_FIELDS = (
+    # Запись: сколько постов разложено, сколько строк ленты вставлено
+    # и сколько постов популярных авторов не раскладывалось.
+    'push_posts',
+    'push_rows',
+    'push_skipped',
+    # Чтение: сколько было слияний, сколько потоков в них участвовало
+    # и сколько строк из потоков пришлось прочитать.
+    'read_merges',
+    'read_streams',
+    'read_rows',
+)
+
+
+def incr_stat(name, delta=1):
+    key = STATS_KEY.format(name)
+    if not cache.add(key, delta, timeout=None):
+        cache.incr(key, delta)
+
+
+def get_stats():
+    """Счётчики работы ленты на стороне записи и чтения."""
+    values = cache.get_many([STATS_KEY.format(name)
+                             for name in STATS_FIELDS])
+    return {name: values.get(STATS_KEY.format(name), 0)
+            for name in STATS_FIELDS}
+
+
+def reset_stats():
+    cache.delete_many([STATS_KEY.format(name) for name in STATS_FIELDS])
+
+
+def is_popular(author_id):
+    """Автор с числом подписчиков выше порога читается при чтении.
+
+    Число подписчиков берётся из UserStats, а не считается по Follow.
+    """
+    followers = UserStats.objects.filter(
+        user_id=author_id
+    ).values_list('followers_count', flat=True).first()
+    return (followers or 0) > settings.FANOUT_FOLLOWER_THRESHOLD
+
+
+def popular_authors(user):
+    """id авторов, на которых подписан user и чьи записи не раскладываются."""
+    return list(
+        UserStats.objects.filter(
+            user__in=Follow.objects.filter(user=user).values('author'),
+            followers_count__gt=settings.FANOUT_FOLLOWER_THRESHOLD,
+        ).values_list('user_id', flat=True)
+    )
+
+
+def push_post(post):
+    """Раскладывает новую запись по лентам всех подписчиков автора.
+
+    Записи авторов с числом подписчиков выше
+    FANOUT_FOLLOWER_THRESHOLD не раскладываются: их подмешивает
+    HybridFeed при чтении.
+    """
+    incr_stat('push_posts')
+    if is_popular(post.author_id):
+        incr_stat('push_skipped')
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    entries = TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, author_id=post.author_id,
+                       post_id=post.pk, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    incr_stat('push_rows', len(entries))
+
+
+def backfill(user_id, author_id, limit=None):
+    """Добавляет в ленту подписчика уже опубликованные записи автора.
+
+    Делается и для популярных авторов: если автор опустится ниже
+    порога, его старые записи останутся в ленте. С limit добавляются
+    только limit свежих записей; возвращает True, если остались ещё.
+    """
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).order_by('-pub_date', '-id').values_list('pk', 'pub_date')
+    if limit is not None:
+        posts = list(posts[:limit + 1])
+        rest, posts = len(posts) > limit, posts[:limit]
+    else:
+        rest, posts = False, posts.iterator()
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, author_id=author_id, post_id=pk,
+                       pub_date=pub_date)
+         for pk, pub_date in posts),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    return rest
+
+
+def unpopular(author_id):
+    """Раскладывает записи автора, опустившегося до порога, по лентам.
+
+    Пока автор был популярен, его новые записи не раскладывались, а
+    подмешивались при чтении. Теперь HybridFeed их не подмешивает,
+    поэтому недостающие строки досоздаются у всех подписчиков.
+    Выполняется задачей posts.unpopular в воркере очереди.
+    """
+    if is_popular(author_id):
+        # Пока задача ждала очереди, автор снова набрал подписчиков.
+        return
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    for user_id in followers.iterator():
+        backfill(user_id, author_id)
+
+
+def backfill_rest(user_id, author_id):
+    """Досоздаёт старые записи автора; выполняется задачей posts.backfill."""
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        backfill(user_id, author_id)
+
+
+def prune(user_id, author_id):
+    """Убирает записи автора из ленты после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, author_id=author_id
+    ).delete()
+
+
+# Поля поста, которые в материализованной ленте есть в самой строке
+# TimelineEntry: по ним поток ленты сортируется и листается по индексу
+# timeline_user_pub_date_idx.
+TIMELINE_FIELDS = {
+    'pub_date': 'timeline_entries__pub_date',
+    'id': 'timeline_entries__post_id',
+}
+
+
+def on_timeline(lookup):
+    """lookup по полю поста в пересчёте на строку ленты."""
+    field, separator, rest = lookup.partition('__')
+    if field not in TIMELINE_FIELDS:
+        return lookup
+    return TIMELINE_FIELDS[field] + separator + rest
+
+
+def timeline_ordering(name):
+    # F, а не строка: иначе order_by по post_id уходит в JOIN с постом
+    # ради его сортировки по умолчанию.
+    field = name.lstrip('-')
+    if field not in TIMELINE_FIELDS:
+        return name
+    ordered = F(TIMELINE_FIELDS[field])
+    return ordered.desc() if name.startswith('-') else ordered.asc()
+
+
+def timeline_condition(condition):
+    """Копия Q, где условия по pub_date и id поста перенесены на ленту."""
+    return Q._new_instance(
+        [timeline_condition(child) if isinstance(child, Q)
+         else (on_timeline(child[0]), child[1])
+         for child in condition.children],
+        condition.connector, condition.negated)
+
+
+class HybridFeed:
+    """Лента подписок: разложенные записи плюс записи популярных авторов.
+
+    Потоки (материализованная лента и по одному на каждого популярного
+    автора) уже отсортированы базой; срез собирается k-way слиянием
+    через heapq.merge, из каждого потока читается не больше stop строк.
+    filter/order_by/select_related применяются ко всем потокам, поэтому
+    объект подходит и для Paginator, и для CursorPaginator. Условия
+    filter складываются в один Q: в материализованной ленте они идут
+    одним filter() с выбором пользователя, и Django не добавляет второй
+    JOIN с TimelineEntry.
+    """
+
+    def __init__(self, user, popular=None, condition=None, related=(),
+                 ordering=('-pub_date', '-id')):
+        self.user = user
+        self.popular = (popular_authors(user)
+                        if popular is None else popular)
+        self.condition = condition or Q()
+        self.related = related
+        self.ordering = ordering
+
+    def _clone(self, condition=None, related=(), ordering=None):
+        return HybridFeed(self.user, self.popular,
+                          self.condition & (condition or Q()),
+                          self.related + related,
+                          ordering or self.ordering)
+
+    def filter(self, *args, **kwargs):
+        return self._clone(condition=Q(*args, **kwargs))
+
+    def select_related(self, *fields):
+        return self._clone(related=fields)
+
+    def order_by(self, *fields):
+        return self._clone(ordering=fields)
+
+    def streams(self):
+        pushed = Post.objects.filter(
+            Q(timeline_entries__user=self.user)
+            & timeline_condition(self.condition)
+        ).order_by(*map(timeline_ordering, self.ordering))
+        if self.popular:
+            pushed = pushed.exclude(author_id__in=self.popular)
+        querysets = [pushed] + [
+            Post.objects.filter(
+                self.condition, author_id=author_id
+            ).order_by(*self.ordering)
+            for author_id in self.popular
+        ]
+        return [qs.select_related(*self.related) for qs in querysets]
+
+    def count(self):
+        return sum(qs.count() for qs in self.streams())
+
+    def __len__(self):
+        return self.count()
+
+    def _merge(self, stop):
+        streams = [list(qs[:stop]) for qs in self.streams()]
+        fields = [field.lstrip('-') for field in self.ordering]
+        incr_stat('read_merges')
+        incr_stat('read_streams', len(streams))
+        incr_stat('read_rows', sum(len(stream) for stream in streams))
+        return list(islice(heapq.merge(
+            *streams,
+            key=lambda post: tuple(getattr(post, f) for f in fields),
+            reverse=self.ordering[0].startswith('-'),
+        ), stop))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start = index.start or 0
+            return self._merge(index.stop)[start:]
+        return self._merge(index + 1)[index]
+
+    def __iter__(self):
+        return iter(self[:self.count()])
+
+
+def timeline_posts(user):
+    """Посты ленты подписок с учётом гибридной раскладки."""
+    return HybridFeed(user)
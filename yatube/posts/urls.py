@@ -2,6 +2,7 @@ from django.urls import path
 
 from .views import (index, group_posts, profile,
                     post_detail, post_edit, post_create, add_comment,
+                    comment_page, search,
                     follow_index, profile_follow, profile_unfollow)
 
 app_name = 'posts'
@@ -14,6 +15,8 @@ urlpatterns = [
     path('create/', post_create, name='create'),
     path('posts/<int:post_id>/edit/', post_edit, name='edit'),
     path('posts/<int:post_id>/comment/', add_comment, name='add_comment'),
+    path('posts/<int:post_id>/comments/', comment_page, name='comments'),
+    path('search/', search, name='search'),
     path('follow/', follow_index, name='follow_index'),
     path('profile/<str:username>/follow/', profile_follow,
          name='profile_follow'),
@@ -1,24 +1,47 @@
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
 from django.core.paginator import Paginator
 from django.conf import settings
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject
 
+from core.tasks import enqueue
+
+from .conditional import (anonymous_conditional, group_etag, index_etag,
+                          post_etag, profile_etag)
 from .forms import PostForm, CommentForm
+from .generations import bump_post
+from .images import delete_variants
 from .models import Post, Group, Follow
+from .paginators import CountedPaginator, CursorPaginator
+from .search import PostSearch
+from .timeline import timeline_posts
 
 User = get_user_model()
 
 
-def get_paginator(post_list, page_number):
-    paginator = Paginator(post_list, settings.NUMBER_POSTS)
-    return paginator.get_page(page_number)
+def get_paginator(post_list, request, count=None):
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    view_name = getattr(request.resolver_match, 'url_name', None)
+    if ('after' in request.GET or 'before' in request.GET
+            or view_name in settings.CURSOR_PAGINATION_VIEWS):
+        paginator = CursorPaginator(post_list, settings.NUMBER_POSTS)
+        return paginator.get_page(after, before)
+    if count is None:
+        paginator = Paginator(post_list, settings.NUMBER_POSTS)
+    else:
+        paginator = CountedPaginator(post_list, settings.NUMBER_POSTS, count)
+    return paginator.get_page(request.GET.get('page'))
 
 
+@anonymous_conditional(index_etag)
 def index(request):
     page_obj = get_paginator(
         Post.objects.select_related('author', 'group'),
-        request.GET.get('page'),
+        request,
     )
     template = 'posts/index.html'
     context = {
@@ -27,11 +50,12 @@ def index(request):
     return render(request, template, context)
 
 
+@anonymous_conditional(group_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     page_obj = get_paginator(
         group.posts.select_related('author'),
-        request.GET.get('page'),
+        request,
     )
     template = 'posts/group_list.html'
     context = {
@@ -41,11 +65,17 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@anonymous_conditional(profile_etag)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username,
+    )
+    stats = getattr(author, 'stats', None)
     page_obj = get_paginator(
         author.posts.select_related('group'),
-        request.GET.get('page'),
+        request,
+        count=stats.posts_count if stats else None,
     )
     following = (request.user.is_authenticated
                  and request.user.follower.filter(author=author).exists())
@@ -58,12 +88,15 @@ def profile(request, username):
     return render(request, template, context)
 
 
+@anonymous_conditional(post_etag)
 def post_detail(request, post_id):
     post = get_object_or_404(
-        Post.objects.select_related('author', 'group'),
+        Post.objects.select_related('author__stats', 'group'),
         id=post_id,
     )
-    comments = post.comments.select_related('author')
+    # Страница комментариев выбирается, только если фрагмент
+    # post_comments не нашёлся в кэше и шаблон начал её перебирать.
+    comments = SimpleLazyObject(lambda: get_comment_page(post))
     template = 'posts/post_detail.html'
     context = {
         'post': post,
@@ -73,6 +106,70 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+def get_comment_page(post, after=None):
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        settings.NUMBER_COMMENTS,
+        field='created',
+    )
+    return paginator.get_page(after)
+
+
+def comment_page(request, post_id):
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    page = get_comment_page(post, request.GET.get('after'))
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.id,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                }
+                for comment in page
+            ],
+            'next': page.next_cursor,
+        })
+    template = 'posts/includes/comment_list.html'
+    context = {
+        'post': post,
+        'comments': page,
+    }
+    return render(request, template, context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    group = author = None
+    if request.GET.get('group'):
+        group = get_object_or_404(Group, slug=request.GET['group'])
+    if request.GET.get('author'):
+        author = get_object_or_404(User, username=request.GET['author'])
+    sort = 'date' if request.GET.get('sort') == 'date' else 'rank'
+    post_search = PostSearch(query, group=group, author=author)
+    if sort == 'date':
+        page_obj = post_search.by_date(settings.NUMBER_POSTS,
+                                       request.GET.get('after'),
+                                       request.GET.get('before'))
+    else:
+        page_obj = post_search.page(settings.NUMBER_POSTS,
+                                    request.GET.get('after'))
+    params = request.GET.copy()
+    for name in ('after', 'before', 'page'):
+        params.pop(name, None)
+    template = 'posts/search.html'
+    context = {
+        'query': query,
+        'group': group,
+        'author': author,
+        'sort': sort,
+        'page_obj': page_obj,
+        'page_query': params.urlencode() + '&' if params else '',
+    }
+    return render(request, template, context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None,
@@ -81,6 +178,8 @@ def post_create(request):
         create_post = form.save(commit=False)
         create_post.author = request.user
         create_post.save()
+        if create_post.image:
+            enqueue('posts.process_image', post_id=create_post.pk)
         return redirect('posts:profile', create_post.author)
     template = 'posts/create_post.html'
     context = {
@@ -104,7 +203,22 @@ def post_edit(request, post_id):
                     instance=edit_post, )
 
     if form.is_valid():
-        form.save()
+        image_changed = 'image' in form.changed_data
+        with transaction.atomic():
+            form.save()
+            if image_changed:
+                Post.objects.filter(pk=post_id).update(
+                    thumbnails='', image_variants='')
+        if image_changed:
+            # Файлы удаляются, когда пост уже не ссылается на них.
+            # Список старых вариантов остался только в edit_post:
+            # задача увидит очищенное поле.
+            delete_variants(edit_post)
+            # Фрагменты, собранные между сигналом сохранения и очисткой
+            # полей, ещё ссылаются на удалённые файлы.
+            transaction.on_commit(lambda: bump_post(edit_post))
+            if edit_post.image:
+                enqueue('posts.process_image', post_id=post_id)
         return redirect('posts:post_detail', post_id)
     template = 'posts/create_post.html'
     context = {
@@ -129,10 +243,8 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     page_obj = get_paginator(
-        Post.objects.filter(
-            author__following__user=request.user
-        ).select_related('author', 'group'),
-        request.GET.get('page'),
+        timeline_posts(request.user).select_related('author', 'group'),
+        request,
     )
     template = 'posts/follow.html'
     context = {
@@ -46,7 +46,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.slow_queries.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.routers.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -54,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -91,6 +95,37 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения: пути к файлам через запятую в
+# DATABASE_REPLICA_PATHS. Читать с них разрешено GET-запросам к
+# REPLICA_VIEWS (core.routers); клиент, который что-то записал,
+# REPLICA_STICKY_SECONDS секунд читает основную базу.
+DATABASE_REPLICA_PATHS = [
+    path.strip()
+    for path in os.environ.get('DATABASE_REPLICA_PATHS', '').split(',')
+    if path.strip()
+]
+DATABASE_REPLICAS = [f'replica{number}' for number in
+                     range(1, len(DATABASE_REPLICA_PATHS) + 1)]
+for alias, path in zip(DATABASE_REPLICAS, DATABASE_REPLICA_PATHS):
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:follow_index',
+)
+REPLICA_STICKY_SECONDS = 10
+
+# PRAGMA для каждого нового соединения SQLite (см. core.db);
+# при разработке не нужны, боевые значения - в settings_production.
+SQLITE_PRAGMAS = {}
+
 # Добавьте IP адреса, при обращении с которых будет доступен DjDT
 INTERNAL_IPS = [
     '127.0.0.1',
@@ -137,6 +172,7 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
 NUMBER_POSTS: int = 10
+NUMBER_COMMENTS: int = 20
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -149,8 +185,124 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
-CACHES = {
-    'default': {
+# Бэкенд кэша выбирается переменной окружения CACHE_BACKEND:
+# locmem - у каждого процесса свой кэш (по умолчанию, для разработки);
+# sqlite - общий для всех воркеров файл, внешний сервис не нужен;
+# redis и memcached требуют установленных django-redis
+# и python-memcached соответственно.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION')
+CACHE_BACKENDS = {
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'sqlite': {
+        'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+        'LOCATION': CACHE_LOCATION or os.path.join(
+            BASE_DIR, 'cache', 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            # Число ключей проверяется раз в CULL_EVERY записей.
+            'CULL_EVERY': 100,
+        },
+    },
+    'redis': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': CACHE_LOCATION or 'redis://127.0.0.1:6379/1',
+    },
+    'memcached': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': CACHE_LOCATION or '127.0.0.1:11211',
+    },
 }
+CACHES = {
+    'default': CACHE_BACKENDS[CACHE_BACKEND],
+}
+
+# Ленты, которые по умолчанию листаются курсором (after/before)
+# вместо номеров страниц. Остальные переходят на курсор,
+# только если в запросе передан ?after= или ?before=.
+CURSOR_PAGINATION_VIEWS = ()
+
+# Размер пачки при раскладке записей по лентам подписчиков.
+TIMELINE_BATCH_SIZE = 500
+
+# Записи авторов, у которых подписчиков больше порога, не раскладываются
+# по лентам при публикации, а подмешиваются при чтении /follow/.
+FANOUT_FOLLOWER_THRESHOLD = 1000
+
+# Защита кэшей ленты от лавины пересчётов (posts.coalesce).
+# Сколько секунд после мягкого срока можно отдавать прежнее значение.
+FEED_CACHE_STALE_TIMEOUT = 300
+# Коэффициент раннего пересчёта XFetch: больше - пересчёт раньше.
+FEED_CACHE_BETA = 1.0
+# Блокировка пересчёта снимается сама, если воркер упал.
+FEED_CACHE_LOCK_TIMEOUT = 10
+# Сколько ждать пересчёта другим воркером после записи в данные.
+FEED_CACHE_WAIT = 2.0
+FEED_CACHE_POLL_INTERVAL = 0.05
+
+# Размеры миниатюр, которые генерируются при загрузке картинки поста
+# и отдаются шаблонам готовыми URL: имя -> (геометрия, опции sorl).
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+# Локальная очередь задач (core.tasks, manage.py worker).
+TASK_WORKER_PROCESSES = 2
+TASK_MAX_ATTEMPTS = 3
+# Пауза перед первым повтором; дальше она удваивается.
+TASK_RETRY_DELAY = 30
+# Если воркер не закончил задачу за это время, её заберёт другой.
+TASK_LEASE_SECONDS = 300
+
+# Форматы картинок постов, которые отдаются как есть; остальные
+# фоновая задача posts.process_image перекодирует в JPEG или PNG.
+POST_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+POST_IMAGE_QUALITY = 85
+
+# Варианты картинки поста для srcset: ширины и форматы в порядке
+# предпочтения. Форматы, которых не умеет установленный Pillow
+# (AVIF требует pillow-avif-plugin), пропускаются.
+POST_IMAGE_VARIANT_WIDTHS = (320, 640, 960)
+POST_IMAGE_VARIANT_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+POST_IMAGE_VARIANT_ASPECT = (960, 339)
+
+# Сколько вариантов показывают фильтры-фасеты в админке:
+# список ограничен, чтобы не строить его по всей таблице.
+ADMIN_FACET_LIMIT = 20
+
+# Поиск рассматривает не больше стольких самых новых постов с самым
+# редким словом запроса: GROUP BY и сортировка идут по ограниченному
+# набору, а не по всем совпадениям частого слова.
+SEARCH_CANDIDATE_LIMIT = 1000
+
+# Сколько секунд браузер и прокси могут хранить страницы лент,
+# отданные анониму (Cache-Control: public, max-age).
+ANONYMOUS_PAGE_MAX_AGE = 60
+
+# Сколько секунд хранить в кэше готовые страницы лент для анонимов.
+# Устаревшие страницы не отдаются и раньше: ключ включает поколения.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Сколько секунд хранить HTML карточек постов (posts.cards). Ключ
+# зависит от содержимого карточки, устаревшие версии просто истекают.
+POST_CARD_TIMEOUT = 60 * 60 * 24
+
+# Метрики запросов (core.metrics): границы гистограмм в секундах и
+# адреса, с которых доступен /metrics/.
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+
+# Журнал медленных SQL-запросов (core.slow_queries): путь к файлу
+# в переменной SLOW_QUERY_LOG включает его; порог - в миллисекундах.
+SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG')
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 100))
+
+# Выборочное профилирование (core.profiling, страница /profiling/):
+# куда писать профили и файл настройки, как часто воркеры его перечитывают
+# и с каким шагом в секундах снимаются стеки для формата collapsed.
+PROFILING_DIR = os.environ.get('PROFILING_DIR',
+                               os.path.join(BASE_DIR, 'profiles'))
+PROFILING_REFRESH = 5
+PROFILING_INTERVAL = 0.001
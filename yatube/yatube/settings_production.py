@@ -0,0 +1,108 @@
+"""
+Настройки для боевого окружения.
+
+Подключаются переменной DJANGO_SETTINGS_MODULE=yatube.settings_production
+и берут всё из yatube.settings, переопределяя то, что зависит от окружения.
+Значения читаются из переменных окружения:
+
+DJANGO_SECRET_KEY      - обязателен;
+DJANGO_ALLOWED_HOSTS   - хосты через запятую;
+DJANGO_DEBUG           - 1, чтобы временно включить отладку;
+DATABASE_PATH          - путь к файлу SQLite;
+DATABASE_CONN_MAX_AGE  - сколько секунд держать соединение (по умолчанию 600);
+DATABASE_REPLICA_PATHS - файлы реплик только для чтения через запятую;
+CACHE_BACKEND          - sqlite (по умолчанию), redis или memcached;
+SQLITE_CACHE_SIZE_KB, SQLITE_MMAP_SIZE - размеры кэша страниц и mmap.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from core.cache_backends import is_process_local_config
+
+from .settings import *  # noqa: F401,F403
+from .settings import (BASE_DIR, CACHE_BACKENDS, DATABASE_REPLICA_PATHS,
+                       DATABASE_REPLICAS, INSTALLED_APPS, MIDDLEWARE,
+                       TEMPLATES)
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+
+DEBUG = os.environ.get('DJANGO_DEBUG') == '1'
+
+ALLOWED_HOSTS = [
+    host.strip()
+    for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',')
+    if host.strip()
+]
+
+# Приложения и middleware, нужные только при разработке.
+DEVELOPMENT_APPS = ('debug_toolbar',)
+DEVELOPMENT_MIDDLEWARE = ('debug_toolbar.middleware.DebugToolbarMiddleware',)
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS
+                  if app not in DEVELOPMENT_APPS]
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE
+              if middleware not in DEVELOPMENT_MIDDLEWARE]
+
+# Соединение с базой переживает запрос: не платим за открытие каждый раз.
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DATABASE_PATH',
+                               os.path.join(BASE_DIR, 'db.sqlite3')),
+        'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 600)),
+        'OPTIONS': {
+            # Сколько секунд ждать блокировку записи другим процессом.
+            'timeout': 20,
+        },
+    }
+}
+for alias, path in zip(DATABASE_REPLICAS, DATABASE_REPLICA_PATHS):
+    DATABASES[alias] = dict(DATABASES['default'], NAME=path,
+                            TEST={'MIRROR': 'default'})
+
+# Поколения, кэш страниц, блокировки пересчёта и сброс кэша из воркера
+# очереди работают, только если кэш общий для всех процессов.
+CACHES = {
+    'default': CACHE_BACKENDS[os.environ.get('CACHE_BACKEND', 'sqlite')],
+}
+if is_process_local_config(CACHES['default']):
+    raise ImproperlyConfigured(
+        'В боевом окружении нужен общий для процессов кэш: '
+        'CACHE_BACKEND=sqlite, redis или memcached.')
+
+# Применяются к каждому новому соединению SQLite (core.db).
+# WAL позволяет читать во время записи; synchronous=NORMAL в режиме WAL
+# не теряет согласованность, но не ждёт fsync на каждой транзакции.
+# Отрицательный cache_size задаётся в килобайтах.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64000)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'temp_store': 'MEMORY',
+}
+
+# Шаблоны компилируются один раз на процесс.
+TEMPLATES = [dict(TEMPLATES[0], APP_DIRS=False)]
+TEMPLATES[0]['OPTIONS'] = dict(
+    TEMPLATES[0]['OPTIONS'],
+    context_processors=[
+        processor
+        for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+        if processor != 'django.template.context_processors.debug'
+    ],
+    loaders=[
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ],
+)
+
+STATIC_ROOT = os.environ.get('STATIC_ROOT',
+                             os.path.join(BASE_DIR, 'collected_static'))
+
+SESSION_COOKIE_SECURE = os.environ.get('DJANGO_SECURE_COOKIES', '1') == '1'
+CSRF_COOKIE_SECURE = SESSION_COOKIE_SECURE
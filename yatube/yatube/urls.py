@@ -1,10 +1,10 @@
-import debug_toolbar
-
 from django.contrib import admin
 from django.conf import settings
 from django.conf.urls.static import static
 from django.urls import include, path
 
+from core.views import metrics, profiling_settings
+
 
 handler404 = 'core.views.page_not_found'
 handler403 = 'core.views.permission_denied'
@@ -12,9 +12,12 @@ handler500 = 'core.views.server_error'
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics/', metrics, name='metrics'),
+    path('profiling/', profiling_settings, name='profiling'),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/v1/', include('posts.api_urls', namespace='api_v1')),
     path('', include('posts.urls')),
 ]
 
@@ -22,4 +25,7 @@ if settings.DEBUG:
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
-    urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)
+    if 'debug_toolbar' in settings.INSTALLED_APPS:
+        import debug_toolbar
+
+        urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)